@@ -3,6 +3,11 @@ ASGI config for LibraryProject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Uses LibraryProject.settings_asgi, which serves the async versions of the
+read-only catalog views, e.g.:
+
+    uvicorn LibraryProject.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -11,6 +16,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LibraryProject.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LibraryProject.settings_asgi")
 
 application = get_asgi_application()
@@ -0,0 +1,71 @@
+"""
+Response compression for the project: gzip everywhere, Brotli when the
+optional ``brotli`` package is installed.
+
+CompressionMiddleware compresses HTML and other dynamic responses per
+request. Static files are compressed once, at collectstatic time, by
+LibraryProject.staticfiles.CompressedManifestStaticFilesStorage, and
+served with the matching Content-Encoding without any per-request work.
+"""
+
+import gzip
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_br = _lazy_re_compile(r'\bbr\b')
+
+# Content types worth compressing; images, archives and fonts already are
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml')
+
+
+def accepts_brotli(request):
+    return brotli is not None and bool(re_accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+
+def compress_gzip(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    """
+    Brotli-compress data, or return None if brotli isn't installed.
+    """
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that answers with Brotli (quality 5, fast enough per
+    request) when the client accepts it and brotli is installed. Streaming
+    responses and everything else fall back to GZipMiddleware.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or len(response.content) < 200
+            or response.has_header('Content-Encoding')
+            or not accepts_brotli(request)
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(response.content, quality=5)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
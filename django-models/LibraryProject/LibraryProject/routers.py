@@ -0,0 +1,146 @@
+"""
+Read/write splitting between the primary database and read replicas.
+
+ReplicaRouter sends reads of relationship_app and bookshelf models to a
+randomly chosen alias from REPLICA_DATABASES and every write to the
+primary ('default'). Replicas lag behind the primary, so requests that
+will write (every method but GET, HEAD, OPTIONS and TRACE) read from the
+primary from the start, a request that writes anyway reads from the
+primary for the rest of the request, and
+PrimaryPinMiddleware sets a short-lived cookie that keeps the client's
+following requests (e.g. the redirect after add_book) on the primary for
+REPLICA_PIN_SECONDS. Without replicas configured everything goes to the
+primary and no cookie is set. PRIMARY_ONLY_MODELS, whose rows are polled
+for changes made moments ago, are always read from the primary, and
+use_primary() sends every read in a block there; it wraps the reads
+whose results fill long-lived caches, which would otherwise keep a lagging
+replica's rows under a fresh version for the whole cache timeout.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+ROUTED_APP_LABELS = {'relationship_app', 'bookshelf'}
+# Background job state is polled by clients and claimed by workers; the
+# catalog version must reflect writes made moments ago
+PRIMARY_ONLY_MODELS = {'relationship_app.job', 'relationship_app.catalogversion'}
+PIN_COOKIE = 'primary_pin'
+# Methods that don't write, so their reads may go to a replica
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+# Pinned by a recent write of this client (the pin cookie)
+_pinned = ContextVar('primary_pinned', default=False)
+# Set once the current request (or command) writes a routed model
+_wrote = ContextVar('primary_written', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def is_pinned():
+    """
+    Return True when reads must go to the primary in the current context.
+    """
+    return _pinned.get() or _wrote.get()
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside the block, e.g. when the rows read must
+    match state that is only read from the primary.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Route reads of ROUTED_APP_LABELS models to replicas and writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        replicas = get_replicas()
+        if not replicas or is_pinned() or model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the copy job, never from migrate
+        if db in get_replicas():
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    """
+    Scope the primary pin to the request and carry it over to the client's
+    next requests with a cookie after a write.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(response)
+        finally:
+            self.reset(tokens)
+        return response
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(response)
+        finally:
+            self.reset(tokens)
+        return response
+
+    def start(self, request):
+        pinned = PIN_COOKIE in request.COOKIES or request.method not in SAFE_METHODS
+        return _pinned.set(pinned), _wrote.set(False)
+
+    def finish(self, response):
+        if _wrote.get() and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+
+    def reset(self, tokens):
+        pinned_token, wrote_token = tokens
+        _pinned.reset(pinned_token)
+        _wrote.reset(wrote_token)
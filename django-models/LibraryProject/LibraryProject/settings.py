@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "relationship_app.metrics.MetricsMiddleware",
+    "LibraryProject.routers.PrimaryPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "LibraryProject.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "relationship_app.middleware.UserRoleMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -74,13 +79,85 @@ WSGI_APPLICATION = "LibraryProject.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite with tuned pragmas (see LibraryProject/sqlite_backend/base.py); WAL is
+# enabled once, by migrate.
+# Write transactions take the write lock up front (BEGIN IMMEDIATE) so they wait
+# on busy_timeout instead of failing with "database is locked" on lock upgrade.
+# DJANGO_DATABASE_PATH points the project at another database file.
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "ENGINE": "LibraryProject.sqlite_backend",
+        "NAME": os.environ.get("DJANGO_DATABASE_PATH", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Optional read replicas: DJANGO_REPLICA_DATABASES is a list of SQLite files
+# (separated by os.pathsep) kept up to date with `manage.py refresh_replica`.
+# Reads of the catalog apps are routed to them by LibraryProject/routers.py.
+
+REPLICA_PATHS = os.environ.get("DJANGO_REPLICA_DATABASES", "")
+
+for index, path in enumerate(filter(None, REPLICA_PATHS.split(os.pathsep)), start=1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+
+DATABASE_ROUTERS = ["LibraryProject.routers.ReplicaRouter"]
+
+# After a write, the client's reads stay on the primary for this many seconds
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory caches are per process; set DJANGO_CACHE_URL (e.g. redis://127.0.0.1:6379/1)
+# to share cached data between workers in production.
+
+CACHE_URL = os.environ.get("DJANGO_CACHE_URL")
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# Template fragment cache for book cards in list_books.html
+BOOK_CARD_CACHE = "default"
+BOOK_CARD_CACHE_TIMEOUT = 60 * 60
+
+# Cached distinct author/year values for the bookshelf admin filters
+BOOKSHELF_FACET_CACHE_TIMEOUT = 60 * 60
+
+# Bearer token required to scrape /metrics, which is disabled when unset
+# (see relationship_app/metrics.py)
+METRICS_TOKEN = os.environ.get("DJANGO_METRICS_TOKEN", "")
+
+# Cached UserProfile roles (see relationship_app/roles.py)
+USER_ROLE_CACHE_TIMEOUT = 60 * 60
+
+# Cached permission sets (see relationship_app/backends.py)
+AUTHENTICATION_BACKENDS = ["relationship_app.backends.CachedPermissionBackend"]
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,6 +194,18 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# collectstatic stores content-hashed copies plus .gz/.br variants; see
+# LibraryProject/staticfiles.py
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "LibraryProject.staticfiles.CompressedManifestStaticFilesStorage",
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -126,3 +215,20 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Authentication settings
 LOGIN_REDIRECT_URL = '/relationship/books/'
 LOGOUT_REDIRECT_URL = '/relationship/login/'
+
+# Catalog pagination settings (keyset/cursor pagination, see relationship_app/pagination.py)
+CATALOG_PAGE_SIZE = 20
+CATALOG_MAX_PAGE_SIZE = 100
+
+# Rows fetched per query by the streaming catalog export
+CATALOG_EXPORT_CHUNK_SIZE = 2000
+
+# Read list_books, search and export from the denormalized CatalogEntry table
+# (see relationship_app/catalog.py) instead of joining the source tables
+CATALOG_READ_MODEL = True
+
+# Background jobs run by "manage.py run_workers" (see relationship_app/jobs.py)
+JOB_FILES_DIR = BASE_DIR / "jobfiles"
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF_SECONDS = 30
+JOB_RETRY_BACKOFF_MAX_SECONDS = 60 * 60
@@ -0,0 +1,10 @@
+"""
+Settings for running LibraryProject under an ASGI server (see asgi.py).
+
+Identical to settings.py except that the read-only catalog views are served
+by their async versions in relationship_app/async_views.py.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = "LibraryProject.urls_asgi"
@@ -0,0 +1,54 @@
+"""
+SQLite backend tuned for concurrent web workers.
+
+A thin subclass of Django's sqlite3 backend that applies performance
+pragmas to every new connection: synchronous=NORMAL (safe with WAL, no
+fsync per commit), a busy timeout instead of immediate "database is locked"
+errors (busy_timeout, taken from the 'timeout' option), memory-mapped I/O
+and a larger page cache. Extra or overriding pragmas can be given in
+DATABASES[...]['OPTIONS']['pragmas']. Write transactions should be started
+with BEGIN IMMEDIATE via the built-in 'transaction_mode' option.
+
+WAL journaling, so readers don't block the writer, is not set here: it is
+stored in the database file, so enable_wal() is run once by the
+relationship_app 0012_enable_wal migration. Setting it on every connection
+would rewrite any database file merely opened, such as one checked into
+the repository, and leave -wal and -shm files next to it.
+"""
+
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    # Negative values are in KiB: a 64 MiB page cache per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # busy_timeout follows the 'timeout' option (seconds, 5 by default,
+        # like sqlite3.connect) instead of overriding it
+        busy_timeout = int(kwargs.get('timeout', 5) * 1000)
+        self.pragmas = {'busy_timeout': busy_timeout, **DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def enable_wal(self):
+        """
+        Switch the database file to WAL journaling; the mode persists in the
+        file. In-memory databases (the test database) can't use WAL.
+        """
+        if self.is_in_memory_db():
+            return
+        with self.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = WAL')
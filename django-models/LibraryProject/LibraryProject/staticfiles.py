@@ -0,0 +1,112 @@
+"""
+Static files with content-hashed names and precompressed variants.
+
+``python manage.py collectstatic`` copies the app stylesheets into
+STATIC_ROOT, stores a copy under a content-hashed name (login.3f2a91c0be4d.css)
+and writes .gz (and, with brotli installed, .br) files next to each
+compressible hashed file. Templates reference the hashed names through
+{% static %}, so a changed file gets a new URL and every URL can be cached
+forever. serve() answers /static/ requests from STATIC_ROOT with the
+precompressed variant the client accepts.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.middleware.gzip import re_accepts_gzip
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from .compression import COMPRESSIBLE_EXTENSIONS, accepts_brotli, compress_brotli, compress_gzip
+
+# One year, the longest lifetime caches reliably honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Unhashed names can change under the same URL
+UNHASHED_MAX_AGE = 60
+# name.<12 hex digits>.ext, the form ManifestStaticFilesStorage.hashed_name() writes
+HASHED_NAME_RE = re.compile(r'^(?P<root>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)?$')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes precompressed variants of
+    the hashed files. Before the first collectstatic (and in tests) files
+    that are missing from STATIC_ROOT are referenced by their plain names
+    instead of raising.
+    """
+
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        if content is None and not self.exists(self.clean_name(filename or urlsplit(unquote(name)).path.strip())):
+            return name
+        return super().hashed_name(name, content, filename)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._write_compressed(hashed_name)
+
+    def _write_compressed(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for suffix, compress in (('.gz', compress_gzip), ('.br', compress_brotli)):
+            compressed = compress(data)
+            # Skip variants that aren't smaller; serve() falls back to the original
+            if compressed is None or len(compressed) >= len(data):
+                continue
+            with open(self.path(name + suffix), 'wb') as handle:
+                handle.write(compressed)
+
+    def is_hashed_name(self, name):
+        """
+        Return True if name is the hashed name the manifest records for a
+        collected file. Strips the hash and looks the original name up in
+        the manifest, so each call is one dict lookup.
+        """
+        match = HASHED_NAME_RE.match(name)
+        return bool(match) and self.hashed_files.get(match['root'] + (match['ext'] or '')) == name
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve a collected static file, preferring its .br or .gz variant when
+    the client accepts it. Hashed names are cached as immutable.
+    """
+    if settings.STATIC_ROOT is None:
+        raise Http404('STATIC_ROOT is not configured.')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path.')
+    if not os.path.isfile(fullpath):
+        raise Http404('File not found.')
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    encoding = None
+    if accepts_brotli(request) and os.path.isfile(fullpath + '.br'):
+        encoding, fullpath = 'br', fullpath + '.br'
+    elif re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')) and os.path.isfile(fullpath + '.gz'):
+        encoding, fullpath = 'gzip', fullpath + '.gz'
+
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if path.endswith(COMPRESSIBLE_EXTENSIONS):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if staticfiles_storage.is_hashed_name(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=UNHASHED_MAX_AGE)
+    return response
@@ -0,0 +1,17 @@
+"""
+URL configuration used under ASGI (see settings_asgi.py): serves the async
+versions of the relationship_app catalog views.
+"""
+
+from django.contrib import admin
+from django.conf import settings
+from django.urls import path, include, re_path
+from LibraryProject.staticfiles import serve as serve_static
+from relationship_app.metrics import metrics_view
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
+    re_path(rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$", serve_static),
+    path("relationship/", include('relationship_app.async_urls')),
+]
@@ -1,12 +1,20 @@
 from django.contrib import admin
+from .filters import CachedAllValuesFieldListFilter
 from .models import Book
+from .paginator import EstimatedCountPaginator
 
 # Register your models here.
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'author', 'publication_year')
-    list_filter = ('author', 'publication_year')
-    search_fields = ('title', 'author')
+    list_filter = (
+        ('author', CachedAllValuesFieldListFilter),
+        ('publication_year', CachedAllValuesFieldListFilter),
+    )
+    # Prefix searches can use the NOCASE indexes; icontains would scan the table
+    search_fields = ('^title', '^author')
     list_per_page = 20
-    ordering = ('title',)
+    ordering = ('title', 'pk')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 admin.site.register(Book, BookAdmin)
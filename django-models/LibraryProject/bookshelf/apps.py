@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BookshelfConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bookshelf"
+
+    def ready(self):
+        # Register facet cache invalidation signal receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,44 @@
+"""
+Cached admin facet values for bookshelf.Book.
+
+Facet value lists are stored under a version that the signal receivers in
+signals.py replace on every Book write, so the changelist doesn't compute
+DISTINCT author/year lists over the whole table on each load.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from LibraryProject.routers import use_primary
+
+_VERSION_KEY = 'bookshelf:facet_version'
+
+
+def get_facet_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(_VERSION_KEY, version, timeout=None)
+        version = cache.get(_VERSION_KEY, version)
+    return version
+
+
+def bump_facet_version():
+    cache.set(_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_facet_values(name, compute):
+    """
+    Return the cached value list for the named facet, computing it with
+    compute() on a miss. compute() reads from the primary, so a lagging
+    replica's values aren't cached under the new version.
+    """
+    key = f'bookshelf:facet:{name}:{get_facet_version()}'
+    values = cache.get(key)
+    if values is None:
+        with use_primary():
+            values = list(compute())
+        cache.set(key, values, settings.BOOKSHELF_FACET_CACHE_TIMEOUT)
+    return values
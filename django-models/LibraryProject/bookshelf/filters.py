@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .cache import get_facet_values
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """
+    AllValuesFieldListFilter whose distinct value list comes from the
+    facet cache instead of a DISTINCT query on every changelist load.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        # The parent builds a lazy queryset; evaluate it only on a cache miss
+        self.lookup_choices = get_facet_values(field_path, lambda: self.lookup_choices)
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookshelf", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["title"], name="bookshelf_book_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["author"], name="bookshelf_book_author_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["publication_year"], name="bookshelf_book_year_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate("title", "NOCASE"),
+                name="bookshelf_book_title_nocase",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate("author", "NOCASE"),
+                name="bookshelf_book_author_nocase",
+            ),
+        ),
+    ]
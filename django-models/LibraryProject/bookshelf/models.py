@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Collate
 
 # Create your models here.
 class Book(models.Model):
@@ -6,5 +7,16 @@ class Book(models.Model):
     author = models.CharField(max_length=100)
     publication_year = models.IntegerField()
     
+    class Meta:
+        indexes = [
+            # Admin ordering and the author/year list filters
+            models.Index(fields=['title'], name='bookshelf_book_title_idx'),
+            models.Index(fields=['author'], name='bookshelf_book_author_idx'),
+            models.Index(fields=['publication_year'], name='bookshelf_book_year_idx'),
+            # Case-insensitive prefix search (LIKE 'x%') in the admin
+            models.Index(Collate('title', 'NOCASE'), name='bookshelf_book_title_nocase'),
+            models.Index(Collate('author', 'NOCASE'), name='bookshelf_book_author_nocase'),
+        ]
+    
     def __str__(self):
         return self.title
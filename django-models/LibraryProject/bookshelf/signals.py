@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_facet_version
+from .models import Book
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_facets(sender, **kwargs):
+    """
+    Invalidate the cached admin facet values after any Book write, right
+    away and again on commit, so values computed by a concurrent request
+    from the rows not yet committed over are not kept.
+    """
+    bump_facet_version()
+    transaction.on_commit(bump_facet_version)
@@ -0,0 +1,200 @@
+"""
+Read-only JSON API over the catalog: books, authors, libraries and
+librarians.
+
+Rows are read with .values() projections of just the requested columns,
+never as model instances. Clients choose the columns with ?fields= and can
+embed related records with ?embed=; each embedded relation costs one extra
+query for the whole page (two for many-to-many), whatever the page size,
+because related rows are fetched by id for all rows at once. Lists use the same keyset cursors as list_books.
+"""
+
+from collections import defaultdict
+
+from .models import Author, Book, Librarian, Library
+from .pagination import paginate_keyset
+
+
+class APIError(ValueError):
+    """
+    Raised for invalid query parameters; the message is shown to the client.
+    """
+
+
+class Resource:
+    """
+    A model exposed by the API.
+
+    fields maps public field names to model columns, ordering is the unique
+    keyset ordering of lists, embeds maps ?embed= names to Embed objects and
+    filters maps query parameters to integer lookups.
+    """
+
+    def __init__(self, model, fields, ordering, embeds=None, filters=None):
+        self.model = model
+        self.fields = fields
+        self.ordering = ordering
+        self.embeds = embeds or {}
+        self.filters = filters or {}
+
+    def parse_fields(self, value):
+        """
+        Return the public field names selected by a ?fields= value.
+        """
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise APIError(f"Unknown fields: {', '.join(unknown)}.")
+        return names
+
+    def fetch(self, queryset, names, extra_columns=()):
+        """
+        Project queryset onto the model columns of the given field names.
+        The primary key and ordering columns are always fetched.
+        """
+        columns = {self.fields[name] for name in names} | set(self.ordering) | {'id'} | set(extra_columns)
+        return queryset.values(*columns)
+
+    def serialize(self, row, names):
+        return {name: row[self.fields[name]] for name in names}
+
+
+class Embed:
+    """
+    A related resource embedded with ?embed=<name>.
+
+    A foreign key embed reads the related id from column; a many-to-many
+    embed reads the (own id, related id) pairs from the through table.
+    """
+
+    def __init__(self, resource, column=None, through=None, own_column=None, other_column=None):
+        self.resource = resource
+        self.column = column
+        self.through = through
+        self.own_column = own_column
+        self.other_column = other_column
+
+    @property
+    def required_columns(self):
+        return {self.column} if self.column else set()
+
+    def attach(self, rows, name, field_value):
+        """
+        Fetch the related records for all rows with one query (two for
+        many-to-many) and add them to each row under name.
+        """
+        resource = RESOURCES[self.resource]
+        names = resource.parse_fields(field_value)
+        if self.column:
+            related_ids = {row[self.column] for row in rows if row[self.column] is not None}
+        else:
+            pairs = defaultdict(list)
+            links = self.through.objects.filter(**{f'{self.own_column}__in': [row['id'] for row in rows]})
+            for own_id, other_id in links.order_by(self.other_column).values_list(self.own_column, self.other_column):
+                pairs[own_id].append(other_id)
+            related_ids = {other_id for other_ids in pairs.values() for other_id in other_ids}
+
+        related = {}
+        if related_ids:
+            queryset = resource.fetch(resource.model.objects.filter(id__in=related_ids), names)
+            related = {record['id']: resource.serialize(record, names) for record in queryset}
+
+        for row in rows:
+            if self.column:
+                row[name] = related.get(row[self.column])
+            else:
+                row[name] = [related[other_id] for other_id in pairs.get(row['id'], []) if other_id in related]
+
+
+RESOURCES = {
+    'books': Resource(
+        Book,
+        fields={'id': 'id', 'title': 'title', 'author': 'author_id', 'updated_at': 'updated_at'},
+        ordering=('title', 'id'),
+        embeds={
+            'author': Embed('authors', column='author_id'),
+            'libraries': Embed(
+                'libraries', through=Library.books.through, own_column='book_id', other_column='library_id',
+            ),
+        },
+        filters={'author': 'author_id', 'library': 'libraries'},
+    ),
+    'authors': Resource(
+        Author,
+        fields={'id': 'id', 'name': 'name', 'book_count': 'book_count', 'updated_at': 'updated_at'},
+        ordering=('name', 'id'),
+    ),
+    'libraries': Resource(
+        Library,
+        fields={'id': 'id', 'name': 'name', 'book_count': 'book_count', 'updated_at': 'updated_at'},
+        ordering=('name', 'id'),
+        embeds={'librarian': Embed('librarians', column='librarian__id')},
+    ),
+    'librarians': Resource(
+        Librarian,
+        fields={'id': 'id', 'name': 'name', 'library': 'library_id'},
+        ordering=('name', 'id'),
+        embeds={'library': Embed('libraries', column='library_id')},
+        filters={'library': 'library_id'},
+    ),
+}
+
+
+def _parse_embeds(resource, value):
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.embeds]
+    if unknown:
+        raise APIError(f"Unknown embeds: {', '.join(unknown)}.")
+    return names
+
+
+def _embed_columns(resource, embed_names):
+    columns = set()
+    for embed_name in embed_names:
+        columns |= resource.embeds[embed_name].required_columns
+    return columns
+
+
+def _serialize_page(resource, rows, names, embed_names, params):
+    rows = list(rows)
+    for embed_name in embed_names:
+        resource.embeds[embed_name].attach(rows, embed_name, params.get(f'fields[{embed_name}]'))
+    return [
+        {**resource.serialize(row, names), **{embed_name: row[embed_name] for embed_name in embed_names}}
+        for row in rows
+    ]
+
+
+def list_resource(resource_name, params, cursor=None, page_size=None):
+    """
+    Return (results, KeysetPage) for one page of a resource.
+    params is the request's query dict. Raises APIError for bad parameters
+    and InvalidCursor for a bad cursor.
+    """
+    resource = RESOURCES[resource_name]
+    names = resource.parse_fields(params.get('fields'))
+    embed_names = _parse_embeds(resource, params.get('embed'))
+    queryset = resource.fetch(resource.model.objects.all(), names, _embed_columns(resource, embed_names))
+    for param, lookup in resource.filters.items():
+        if params.get(param):
+            try:
+                queryset = queryset.filter(**{lookup: int(params[param])})
+            except ValueError:
+                raise APIError(f"{param} must be an id.")
+    page = paginate_keyset(queryset, resource.ordering, cursor, page_size)
+    return _serialize_page(resource, page, names, embed_names, params), page
+
+
+def get_resource(resource_name, pk, params):
+    """
+    Return one serialized record, or None if it doesn't exist.
+    """
+    resource = RESOURCES[resource_name]
+    names = resource.parse_fields(params.get('fields'))
+    embed_names = _parse_embeds(resource, params.get('embed'))
+    rows = list(resource.fetch(resource.model.objects.filter(pk=pk), names, _embed_columns(resource, embed_names)))
+    if not rows:
+        return None
+    return _serialize_page(resource, rows, names, embed_names, params)[0]
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RelationshipAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "relationship_app"
+
+    def ready(self):
+        # Register cache invalidation signal receivers
+        from . import signals  # noqa: F401
+        # Install the metrics query recorder on connections opened from now on
+        from . import metrics  # noqa: F401
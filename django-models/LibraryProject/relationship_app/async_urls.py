@@ -0,0 +1,21 @@
+"""
+relationship_app URLs for ASGI deployments: the same routes as urls.py with
+the read-only catalog views swapped for their async versions.
+"""
+
+from django.urls import URLPattern
+
+from . import async_views
+from .urls import app_name, urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'list_books': async_views.list_books,
+    'search_books': async_views.search_books,
+    'library_detail': async_views.LibraryDetailView.as_view(),
+}
+
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,126 @@
+"""
+Async versions of the read-only catalog views.
+
+Served instead of their sync counterparts when the project runs under an
+ASGI server (see LibraryProject/asgi.py and async_urls.py), so a request
+doesn't hold a worker thread while it waits on the database. Queries go
+through Django's async ORM; only the raw FTS query in search_books and the
+catalog version reads (ETags and book card versions) are handed to the
+sync thread explicitly.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseBadRequest
+from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.http import condition, require_GET
+
+from LibraryProject.routers import use_primary
+
+from .catalog import catalog_books
+from .models import Library
+from .pagination import InvalidCursor, apaginate_keyset, get_page_size
+from .search import search_books as run_search
+from .views import (
+    book_list_context, book_page_response, catalog_etag, library_detail_queryset, search_page_response,
+)
+
+
+def catalog_condition(view):
+    """
+    views.catalog_condition for async views. condition() would call the
+    ETag function on the event loop, and it reads the catalog version from
+    the database, so the ETag is computed in the sync thread first. The
+    primary pin is a context variable, so it also covers the queries run
+    in sync threads.
+    """
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        with use_primary():
+            etag = await sync_to_async(catalog_etag)(request, *args, **kwargs)
+            conditional = condition(etag_func=lambda *args, **kwargs: etag)(view)
+            return await conditional(request, *args, **kwargs)
+    return inner
+
+
+async def load_user(request):
+    """
+    Resolve the user, session and permissions ahead of rendering.
+
+    Templates read request.user and perms synchronously, which would query
+    the database from the event loop; loading them here with the async API
+    leaves only cached lookups for the template.
+    """
+    user = await request.auser()
+    request.user = user
+    if user.is_authenticated:
+        # Fills the backend's per-user permission cache used by has_perm()
+        await user.aget_all_permissions()
+    return user
+
+
+# Async function-based view for listing all books
+@catalog_condition
+async def list_books(request):
+    """
+    Async version of views.list_books.
+    """
+    page_size = get_page_size(request.GET.get('page_size'))
+    books = catalog_books()
+    try:
+        page = await apaginate_keyset(books, ('title', 'id'), request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+
+    if request.GET.get('format') == 'json':
+        return book_page_response(page, page_size)
+
+    user = await load_user(request)
+    context = await sync_to_async(book_list_context)(
+        page, page_size,
+        can_change_book=await user.ahas_perm('relationship_app.can_change_book'),
+        can_delete_book=await user.ahas_perm('relationship_app.can_delete_book'),
+    )
+    return render(request, 'relationship_app/list_books.html', context)
+
+
+@require_GET
+async def search_books(request):
+    """
+    Async version of views.search_books. The FTS5 query is raw SQL, which
+    has no async API, so it runs in the sync thread.
+    """
+    query = request.GET.get('q', '').strip()
+    page_size = get_page_size(request.GET.get('page_size'))
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return HttpResponseBadRequest('page must be a number.')
+
+    results, has_next = await sync_to_async(run_search)(query, page, page_size) if query else ([], False)
+    return search_page_response(query, page, results, has_next)
+
+
+@method_decorator(catalog_condition, name='get')
+class LibraryDetailView(View):
+    """
+    Async version of views.LibraryDetailView.
+    """
+    template_name = 'relationship_app/library_detail.html'
+
+    async def get(self, request, pk):
+        try:
+            library = await library_detail_queryset().aget(pk=pk)
+        except Library.DoesNotExist:
+            raise Http404('No library found matching the query.')
+        await load_user(request)
+        context = {
+            'library': library,
+            'object': library,
+            'view': self,
+            'books_count': library.book_count,
+        }
+        return render(request, self.template_name, context)
@@ -0,0 +1,51 @@
+"""
+Authentication backend with cached permission sets.
+
+ModelBackend resolves a user's permissions with two joins (direct and
+group permissions) the first time they are checked in a request. This
+backend keeps the resolved set in the shared cache, keyed by the global
+permissions version from cache.py, so @permission_required and the
+{{ perms }} checks in templates usually cost no queries at all, across
+requests and workers. The receivers in signals.py replace the version
+whenever user or group permissions, group membership or the permissions
+themselves change, which orphans every cached set at once.
+
+The version only reaches every worker through a shared cache. When the
+default cache is private to each process (LocMemCache), a grant revoked
+in one worker would stay cached in the others for PERMISSION_CACHE_TIMEOUT,
+so the backend behaves like ModelBackend and caches nothing.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .cache import get_permissions_version, is_process_local
+
+
+def _permissions_cache_key(version, user):
+    # date_joined tells apart users given a deleted user's id (SQLite reuses
+    # the highest ids); superusers get every permission regardless of grants
+    joined = int(user.date_joined.timestamp() * 1_000_000)
+    return f'relationship_app:permissions:{version}:{user.pk}:{joined}:{int(user.is_superuser)}'
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend whose get_all_permissions() is served from the cache,
+    when the cache is shared between processes.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if is_process_local():
+            return super().get_all_permissions(user_obj, obj)
+        if not hasattr(user_obj, '_perm_cache'):
+            key = _permissions_cache_key(get_permissions_version(), user_obj)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, settings.PERMISSION_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
@@ -0,0 +1,157 @@
+"""
+Synthetic catalog generation and view timing helpers for the benchmark
+management command.
+"""
+
+import random
+import statistics
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from .cache import bump_catalog_version
+from .catalog import rebuild_catalog_entries
+from .counters import reconcile_book_counts
+from .models import Author, Book, Librarian, Library
+from .search import rebuild_search_index
+
+# Named catalog sizes for --scale
+SCALES = {
+    'small': {'books': 1000, 'libraries': 10},
+    'medium': {'books': 100000, 'libraries': 50},
+    'large': {'books': 1000000, 'libraries': 200},
+}
+
+
+def generate_catalog(books, libraries, density=0.1, books_per_author=10, batch_size=5000, seed=0):
+    """
+    Fill the database with a synthetic catalog.
+
+    Every library holds roughly density * books randomly chosen books.
+    Rows are inserted with bulk_create, so per-instance signals don't fire;
+    the search index, book counters, catalog entries and catalog version
+    are brought up to date at the end instead.
+    """
+    rng = random.Random(seed)
+    author_count = max(1, books // books_per_author)
+    with transaction.atomic():
+        Author.objects.bulk_create(
+            (Author(name=f"Author {i:07d}") for i in range(author_count)), batch_size=batch_size
+        )
+        author_ids = list(Author.objects.order_by('id').values_list('id', flat=True))
+        Book.objects.bulk_create(
+            (Book(title=f"Book {rng.randrange(books * 10):08d}", author_id=author_ids[i % author_count])
+             for i in range(books)),
+            batch_size=batch_size,
+        )
+        book_ids = list(Book.objects.values_list('id', flat=True))
+
+        library_objects = Library.objects.bulk_create([Library(name=f"Library {i:04d}") for i in range(libraries)])
+        library_ids = list(Library.objects.order_by('id').values_list('id', flat=True))
+        Librarian.objects.bulk_create(
+            [Librarian(name=f"Librarian {i:04d}", library_id=library_id) for i, library_id in enumerate(library_ids)]
+        )
+
+        Holding = Library.books.through
+        per_library = min(len(book_ids), int(len(book_ids) * density))
+        for library_id in library_ids:
+            Holding.objects.bulk_create(
+                (Holding(library_id=library_id, book_id=book_id) for book_id in rng.sample(book_ids, per_library)),
+                batch_size=batch_size,
+            )
+        reconcile_book_counts()
+    rebuild_catalog_entries(chunk_size=batch_size)
+    rebuild_search_index()
+    bump_catalog_version()
+    return {'authors': author_count, 'books': books, 'libraries': len(library_objects), 'holdings_per_library': per_library}
+
+
+def percentile(samples, fraction):
+    """
+    Return the nearest-rank percentile of a sorted list of samples.
+    """
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def measure(request, iterations, setup=None):
+    """
+    Time iterations calls of request() and count the queries of one extra
+    call. setup(), if given, runs untimed before every call and its result
+    is passed to request(). Returns a dict of latency stats in milliseconds.
+    """
+    def call():
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        response = request(argument)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f"Benchmarked request failed with status {response.status_code}")
+        return elapsed
+
+    # The query log is a bounded deque; start from an empty one so the
+    # captured count isn't lost to an already full log.
+    argument = setup() if setup else None
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        request(argument)
+    # Count now: later requests reset the query log the capture reads from
+    query_count = len(queries)
+
+    timings = sorted(call() for _ in range(iterations))
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': query_count,
+    }
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Return a list of human readable regressions of results against baseline:
+    p95 latency more than tolerance slower, or more queries per request.
+    """
+    regressions = []
+    for name, current in results['views'].items():
+        previous = baseline.get('views', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+    return regressions
+
+
+def sqlite_write_worker(database, seconds, worker_id):
+    """
+    Run add_book-like write transactions (a read followed by an insert)
+    against the given DATABASES entry for the given number of seconds.
+    Meant to run in a separate process set up with django.setup();
+    returns (commits, lock errors).
+    """
+    from django.conf import settings
+    from django.db import OperationalError, connections
+
+    configured = connections.configure_settings({**settings.DATABASES, 'bench': dict(database)})
+    connections.settings['bench'] = configured['bench']
+    commits = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with transaction.atomic(using='bench'):
+                with connections['bench'].cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM bench_book WHERE author_id = %s", [worker_id])
+                    cursor.execute(
+                        "INSERT INTO bench_book (title, author_id) VALUES (%s, %s)",
+                        [f"Book {commits}", worker_id],
+                    )
+            commits += 1
+        except OperationalError:
+            errors += 1
+    connections['bench'].close()
+    return commits, errors
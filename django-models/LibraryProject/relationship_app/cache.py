@@ -0,0 +1,136 @@
+"""
+Cache helpers for relationship_app.
+
+Book cards in list_books.html are cached as template fragments keyed by
+book id, a per-book version and the viewer's permission bits. Versions live
+in the cache configured by BOOK_CARD_CACHE and are replaced whenever a book,
+its author or its holdings change (see signals.py), right away and again
+when the transaction commits, so stale fragments are simply never looked up
+again and expire on their own.
+
+The catalog as a whole has a version too, replaced on every Book, Author,
+Library, Librarian or holdings change. Catalog pages derive their ETags
+from it. It is stored in the CatalogVersion row rather than the cache, so
+a change made by one worker process (or a run_workers job) is seen by all
+of them, and it is committed or rolled back with the change itself. When
+the card cache is private to each process (LocMemCache), per-book versions
+set in one process can't reach the others, so cards are keyed by the
+catalog version instead.
+
+Resolved user permission sets (see backends.py) are cached under a global
+permissions version, replaced whenever a permission, group or user's
+grants change.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import CatalogVersion
+
+PERMISSIONS_VERSION_KEY = 'relationship_app:permissions_version'
+
+
+def get_card_cache_alias():
+    """
+    Return the alias of the cache backend used for book card fragments.
+    """
+    return getattr(settings, 'BOOK_CARD_CACHE', 'default')
+
+
+def is_process_local(alias='default'):
+    """
+    Return True when the cache is private to each process, so values set
+    by one worker are never seen by the others.
+    """
+    return isinstance(caches[alias], LocMemCache)
+
+
+def _card_version_key(book_id):
+    return f'relationship_app:book_card_version:{book_id}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_book_card_versions(book_ids):
+    """
+    Return a {book_id: version} dict, assigning a fresh version to books
+    that have none yet. Uses a single get_many/set_many round trip, or
+    the catalog version for every book when the card cache is process-local.
+    """
+    if is_process_local(get_card_cache_alias()):
+        version = get_catalog_version()
+        return {book_id: version for book_id in book_ids}
+    cache = caches[get_card_cache_alias()]
+    keys = {_card_version_key(book_id): book_id for book_id in book_ids}
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_book_card_versions(book_ids):
+    """
+    Invalidate the cached cards of the given books.
+    """
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    version = _new_version()
+    caches[get_card_cache_alias()].set_many(
+        {_card_version_key(book_id): version for book_id in book_ids}, timeout=None
+    )
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # add() so concurrent requests agree on the version that wins
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version, starting one on first use.
+    """
+    versions = CatalogVersion.objects.filter(pk=1).values_list('version', flat=True)
+    version = versions.first()
+    if version is None:
+        # ignore_conflicts so concurrent requests agree on the version that wins
+        CatalogVersion.objects.bulk_create([CatalogVersion(pk=1, version=_new_version())], ignore_conflicts=True)
+        version = versions.first()
+    return version
+
+
+def bump_catalog_version():
+    """
+    Mark the catalog as changed. Inside a transaction the new version is
+    only seen once the transaction commits.
+    """
+    CatalogVersion.objects.bulk_create(
+        [CatalogVersion(pk=1, version=_new_version())],
+        update_conflicts=True, unique_fields=['id'], update_fields=['version'],
+    )
+
+
+def get_permissions_version():
+    """
+    Return the current permissions version, starting a new one if the
+    cache has none.
+    """
+    return _get_version(PERMISSIONS_VERSION_KEY)
+
+
+def bump_permissions_version():
+    """
+    Invalidate every cached permission set.
+    """
+    cache.set(PERMISSIONS_VERSION_KEY, _new_version(), timeout=None)
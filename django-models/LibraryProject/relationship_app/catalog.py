@@ -0,0 +1,200 @@
+"""
+Denormalized catalog read model.
+
+CatalogEntry keeps one row per book with its title, author name and the ids
+of the libraries holding it, so list_books, search and export read a single
+table through its (title, id) and author_id indexes instead of joining
+Book, Author and the Library.books through table. The same holdings are
+kept as CatalogHolding rows, whose (library_id, book_id) index lets a
+library filter seek to that library's books instead of matching the packed
+ids of every entry. With CATALOG_READ_MODEL off they go back to the source
+tables.
+
+Entries are refreshed incrementally by the receivers in signals.py, inside
+the transaction that changes the books, authors or holdings. Bulk loaders
+skip those receivers and call rebuild_catalog_entries() instead
+(``python manage.py rebuild_catalog``); check_catalog_entries()
+(``python manage.py check_catalog``) compares the table with the source
+tables and reports or repairs any drift.
+"""
+
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Book, CatalogEntry, CatalogHolding, Library
+
+_ID_CHUNK_SIZE = 500
+
+ENTRY_FIELDS = ('title', 'author_id', 'author_name', 'library_ids')
+
+
+def pack_library_ids(library_ids):
+    """
+    Pack library ids as ",1,4,7,".
+    """
+    library_ids = sorted(library_ids)
+    return f",{','.join(map(str, library_ids))}," if library_ids else ''
+
+
+def unpack_library_ids(value):
+    return [int(library_id) for library_id in value.split(',') if library_id]
+
+
+def catalog_books():
+    """
+    Return the queryset the catalog read views page through: rows with
+    id, title, author_id and author_name, orderable by (title, id).
+    """
+    if settings.CATALOG_READ_MODEL:
+        return CatalogEntry.objects.all()
+    return Book.objects.annotate(author_name=F('author__name'))
+
+
+def filter_catalog(queryset, author_id=None, library_id=None):
+    """
+    Narrow a catalog_books() queryset to an author and/or a library.
+    """
+    if author_id is not None:
+        queryset = queryset.filter(author_id=author_id)
+    if library_id is not None:
+        if queryset.model is CatalogEntry:
+            holdings = CatalogHolding.objects.filter(library_id=library_id).values('book_id')
+            queryset = queryset.filter(id__in=holdings)
+        else:
+            queryset = queryset.filter(libraries=library_id)
+    return queryset
+
+
+def iter_source_entries(queryset=None, chunk_size=2000):
+    """
+    Yield unsaved CatalogEntry objects built from the Book, Author and
+    holdings tables, ordered by book id. Holdings cost one query per chunk.
+    """
+    queryset = Book.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values_list('id', 'title', 'author_id', 'author__name').iterator(chunk_size=chunk_size)
+    Holding = Library.books.through
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        holdings = defaultdict(list)
+        pairs = Holding.objects.filter(book_id__in=[row[0] for row in chunk]).values_list('book_id', 'library_id')
+        for book_id, library_id in pairs:
+            holdings[book_id].append(library_id)
+        for book_id, title, author_id, author_name in chunk:
+            yield CatalogEntry(
+                id=book_id, title=title, author_id=author_id, author_name=author_name,
+                library_ids=pack_library_ids(holdings[book_id]),
+            )
+
+
+def entry_holdings(entries):
+    """
+    Return the unsaved CatalogHolding rows of the given entries.
+    """
+    return [
+        CatalogHolding(library_id=library_id, book_id=entry.id)
+        for entry in entries
+        for library_id in unpack_library_ids(entry.library_ids)
+    ]
+
+
+def refresh_catalog_entries(book_ids):
+    """
+    Recompute the entries and holdings of the given books from the source
+    tables, dropping those of books that no longer exist.
+    """
+    book_ids = sorted(set(book_ids))
+    for start in range(0, len(book_ids), _ID_CHUNK_SIZE):
+        chunk = book_ids[start:start + _ID_CHUNK_SIZE]
+        entries = list(iter_source_entries(Book.objects.filter(id__in=chunk), chunk_size=_ID_CHUNK_SIZE))
+        if entries:
+            CatalogEntry.objects.bulk_create(
+                entries, update_conflicts=True, unique_fields=['id'], update_fields=ENTRY_FIELDS,
+            )
+        CatalogHolding.objects.filter(book_id__in=chunk).delete()
+        CatalogHolding.objects.bulk_create(entry_holdings(entries))
+        gone = set(chunk) - {entry.id for entry in entries}
+        if gone:
+            CatalogEntry.objects.filter(id__in=gone).delete()
+
+
+def rename_author_entries(author_id, name):
+    """
+    Update the author name on all of an author's entries with one UPDATE.
+    """
+    CatalogEntry.objects.filter(author_id=author_id).update(author_name=name)
+
+
+def rebuild_catalog_entries(chunk_size=2000):
+    """
+    Rebuild the entries and holdings from the source tables in one
+    transaction. Returns the number of entries.
+    """
+    count = 0
+    with transaction.atomic():
+        CatalogEntry.objects.all().delete()
+        CatalogHolding.objects.all().delete()
+        entries = iter_source_entries(chunk_size=chunk_size)
+        while chunk := list(itertools.islice(entries, chunk_size)):
+            CatalogEntry.objects.bulk_create(chunk)
+            CatalogHolding.objects.bulk_create(entry_holdings(chunk))
+            count += len(chunk)
+    return count
+
+
+def _entry_key(entry):
+    return (entry.title, entry.author_id, entry.author_name, entry.library_ids, entry.holdings)
+
+
+def _iter_stored_entries(chunk_size):
+    """
+    Yield the stored entries in book id order, each with its CatalogHolding
+    rows packed into a holdings attribute.
+    """
+    entries = CatalogEntry.objects.order_by('id').iterator(chunk_size=chunk_size)
+    while chunk := list(itertools.islice(entries, chunk_size)):
+        holdings = defaultdict(list)
+        pairs = CatalogHolding.objects.filter(book_id__in=[entry.id for entry in chunk])
+        for book_id, library_id in pairs.values_list('book_id', 'library_id'):
+            holdings[book_id].append(library_id)
+        for entry in chunk:
+            entry.holdings = pack_library_ids(holdings[entry.id])
+            yield entry
+
+
+def _iter_source_entries_with_holdings(chunk_size):
+    for entry in iter_source_entries(chunk_size=chunk_size):
+        entry.holdings = entry.library_ids
+        yield entry
+
+
+def check_catalog_entries(chunk_size=2000):
+    """
+    Compare the entries and holdings with the source tables in one pass
+    over both, in book id order. Returns {'missing': [...], 'stale': [...],
+    'orphaned': [...]} with the ids of books without an entry, entries
+    (or holdings) that differ from their book and entries or holdings
+    whose book is gone.
+    """
+    expected = _iter_source_entries_with_holdings(chunk_size)
+    actual = _iter_stored_entries(chunk_size)
+    problems = {'missing': [], 'stale': [], 'orphaned': []}
+    source, entry = next(expected, None), next(actual, None)
+    while source is not None or entry is not None:
+        if entry is None or (source is not None and source.id < entry.id):
+            problems['missing'].append(source.id)
+            source = next(expected, None)
+        elif source is None or entry.id < source.id:
+            problems['orphaned'].append(entry.id)
+            entry = next(actual, None)
+        else:
+            if _entry_key(source) != _entry_key(entry):
+                problems['stale'].append(source.id)
+            source, entry = next(expected, None), next(actual, None)
+    # Holdings left behind by an entry that is gone
+    stray = CatalogHolding.objects.exclude(book_id__in=CatalogEntry.objects.values('id'))
+    stray_ids = set(stray.values_list('book_id', flat=True)) - set(problems['missing'])
+    problems['orphaned'] = sorted(stray_ids.union(problems['orphaned']))
+    return problems
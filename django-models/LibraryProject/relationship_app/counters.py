@@ -0,0 +1,56 @@
+"""
+Denormalized holding counters: Library.book_count and Author.book_count.
+
+The signal receivers in signals.py keep them up to date with F() updates
+issued inside the transaction that changes the holdings or the books, so a
+library or author page reads its count from a column instead of running a
+COUNT. Bulk inserts and raw SQL skip the receivers; reconcile_book_counts()
+(``python manage.py reconcile_book_counts``) recomputes the columns from
+the source tables and repairs any drift.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Author, Book, Library
+
+
+def adjust_book_counts(model, deltas):
+    """
+    Add {pk: delta} to model.book_count, one UPDATE per distinct delta.
+    Counts never go below zero, even if they had drifted.
+    """
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta[delta].append(pk)
+    for delta, pks in pks_by_delta.items():
+        count = F('book_count') + delta
+        if delta < 0:
+            count = Greatest(count, 0)
+        model.objects.filter(pk__in=pks).update(book_count=count)
+
+
+def _actual_count(source, field):
+    rows = source.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+    return Coalesce(Subquery(rows.annotate(count=Count('pk')).values('count')), 0)
+
+
+def reconcile_book_counts(dry_run=False):
+    """
+    Recompute Library.book_count and Author.book_count where they drifted.
+    Returns {'library': rows, 'author': rows} with the number of rows that
+    were (or, with dry_run, would be) fixed.
+    """
+    counters = (
+        (Library, Library.books.through, 'library'),
+        (Author, Book, 'author'),
+    )
+    fixed = {}
+    for model, source, field in counters:
+        actual = _actual_count(source, field)
+        drifted = model.objects.exclude(book_count=actual)
+        fixed[model._meta.model_name] = drifted.count() if dry_run else drifted.update(book_count=actual)
+    return fixed
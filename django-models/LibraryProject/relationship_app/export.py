@@ -0,0 +1,61 @@
+"""
+Streaming catalog export.
+
+Books are read with a chunked .values_list() iterator, so memory use
+depends on the chunk size rather than the catalog size. CatalogEntry rows
+carry their holding library ids; for Book rows they come from one query
+per chunk on the Library.books through table.
+"""
+
+import csv
+import itertools
+import json
+from collections import defaultdict
+
+from .catalog import unpack_library_ids
+from .models import Book, CatalogEntry, Library
+
+EXPORT_COLUMNS = ('id', 'title', 'author', 'library_ids')
+
+
+class Echo:
+    """
+    File-like object whose write() returns the value instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_book_rows(queryset=None, chunk_size=2000):
+    """
+    Yield (id, title, author name, [library ids]) tuples ordered by book id,
+    from a Book or CatalogEntry queryset.
+    """
+    queryset = Book.objects.all() if queryset is None else queryset
+    if queryset.model is CatalogEntry:
+        entries = queryset.order_by('id').values_list('id', 'title', 'author_name', 'library_ids')
+        for book_id, title, author, library_ids in entries.iterator(chunk_size=chunk_size):
+            yield book_id, title, author, unpack_library_ids(library_ids)
+        return
+    rows = queryset.order_by('id').values_list('id', 'title', 'author__name').iterator(chunk_size=chunk_size)
+    Holding = Library.books.through
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        holdings = defaultdict(list)
+        pairs = Holding.objects.filter(book_id__in=[row[0] for row in chunk]).order_by('library_id')
+        for book_id, library_id in pairs.values_list('book_id', 'library_id'):
+            holdings[book_id].append(library_id)
+        for book_id, title, author in chunk:
+            yield book_id, title, author, holdings.get(book_id, [])
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for book_id, title, author, library_ids in rows:
+        yield writer.writerow([book_id, title, author, ';'.join(map(str, library_ids))])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n'
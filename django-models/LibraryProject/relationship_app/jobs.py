@@ -0,0 +1,300 @@
+"""
+Database-backed background jobs for heavy catalog maintenance.
+
+Views queue a Job row with enqueue() and return at once; the run_workers
+management command claims due jobs with a conditional UPDATE, so several
+workers never run the same job, and executes them in a pool of local
+processes. Only the database and local processes are needed.
+
+A task is a function registered with @task(name) that takes the Job and
+the job's arguments as keyword arguments and returns a JSON-serializable
+result. Tasks call report_progress() as they go, which is also where a
+cancellation requested for a running job takes effect. A task that
+raises is retried after JOB_RETRY_BACKOFF_SECONDS, doubling per attempt,
+until max_attempts is reached.
+"""
+
+import inspect
+import os
+import socket
+import traceback
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from .cache import bump_catalog_version
+from .catalog import catalog_books, filter_catalog, rebuild_catalog_entries
+from .counters import reconcile_book_counts
+from .export import iter_book_rows, iter_csv, iter_ndjson
+from .models import Job
+from .search import rebuild_search_index
+
+TASKS = {}
+
+
+class JobError(ValueError):
+    """
+    Raised for an unknown task or arguments the task doesn't accept. A task
+    raising it fails at once, without retries.
+    """
+
+
+class JobCancelled(Exception):
+    """
+    Raised by report_progress() when the running job was cancelled.
+    """
+
+
+def task(name):
+    """
+    Register a function as the task run for jobs called name.
+    """
+    def register(function):
+        TASKS[name] = function
+        return function
+    return register
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before retrying a job that failed attempts times.
+    """
+    return min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+
+
+def enqueue(name, arguments=None, user=None, max_attempts=None):
+    """
+    Queue a job and return it. Raises JobError if there is no such task or
+    it doesn't accept the arguments.
+    """
+    arguments = arguments or {}
+    if name not in TASKS:
+        raise JobError(f"Unknown job: {name}.")
+    try:
+        inspect.signature(TASKS[name]).bind(None, **arguments)
+    except TypeError as error:
+        raise JobError(f"Invalid arguments for {name}: {error}.")
+    return Job.objects.create(
+        name=name, arguments=arguments, created_by=user,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def cancel_job(job):
+    """
+    Cancel a job. A queued job is cancelled right away; a running one stops
+    at its next report_progress(). Returns the refreshed job.
+    """
+    now = timezone.now()
+    if not Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+        status=Job.CANCELLED, cancel_requested=True, finished_at=now,
+    ):
+        Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim_next_job(worker):
+    """
+    Mark the next due job as running for worker and return its id, or None
+    when no job is due.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    for job_id in due.values_list('id', flat=True)[:10]:
+        # Only one worker's UPDATE can still see the job queued
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1,
+            progress=0, message='',
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def report_progress(job, percent, message=''):
+    """
+    Record a running job's progress. Raises JobCancelled if the job was
+    cancelled meanwhile. It writes, so call it between queries rather than
+    while an .iterator() is still open.
+    """
+    running = Job.objects.filter(pk=job.pk, status=Job.RUNNING)
+    running.update(progress=max(0, min(int(percent), 100)), message=message[:200])
+    if running.filter(cancel_requested=True).exists():
+        raise JobCancelled()
+
+
+def release_claim(job_id):
+    """
+    Put a claimed job that never started back in the queue, without using
+    up one of its attempts.
+    """
+    Job.objects.filter(pk=job_id, status=Job.RUNNING).update(
+        status=Job.QUEUED, worker='', started_at=None, attempts=F('attempts') - 1,
+    )
+
+
+def record_failure(job_id, error):
+    """
+    Requeue a failed running job with backoff, mark it cancelled if it was
+    cancelled meanwhile, or mark it failed once it has used all its attempts.
+    """
+    job = Job.objects.get(pk=job_id)
+    running = Job.objects.filter(pk=job_id, status=Job.RUNNING)
+    if job.cancel_requested:
+        running.update(status=Job.CANCELLED, error=error, finished_at=timezone.now())
+    elif job.attempts < job.max_attempts:
+        running.update(
+            status=Job.QUEUED, error=error, worker='',
+            run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+        )
+    else:
+        running.update(status=Job.FAILED, error=error, finished_at=timezone.now())
+
+
+def run_job(job_id):
+    """
+    Run a claimed job to completion. Called in a worker process; exceptions
+    raised by the task are recorded on the job, never propagated.
+    """
+    job = Job.objects.get(pk=job_id)
+    running = Job.objects.filter(pk=job_id, status=Job.RUNNING)
+    try:
+        result = TASKS[job.name](job, **job.arguments)
+    except JobCancelled:
+        running.update(status=Job.CANCELLED, finished_at=timezone.now())
+    except JobError as error:
+        running.update(status=Job.FAILED, error=str(error), finished_at=timezone.now())
+    except Exception:
+        record_failure(job_id, traceback.format_exc())
+    else:
+        running.update(status=Job.SUCCEEDED, progress=100, result=result, error='', finished_at=timezone.now())
+    return Job.objects.values_list('status', flat=True).get(pk=job_id)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover_orphaned_jobs():
+    """
+    Treat jobs left running by run_workers processes on this host that have
+    exited as failed attempts. Returns the number of recovered jobs.
+    """
+    host = socket.gethostname()
+    orphaned = [
+        job_id
+        for job_id, worker in Job.objects.filter(status=Job.RUNNING, worker__startswith=f'{host}:').values_list('id', 'worker')
+        if not _pid_alive(int(worker.rsplit(':', 1)[1]))
+    ]
+    for job_id in orphaned:
+        record_failure(job_id, 'The worker running this job exited.')
+    return len(orphaned)
+
+
+def serialize_job(job):
+    return {
+        'id': job.pk,
+        'name': job.name,
+        'arguments': job.arguments,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'cancel_requested': job.cancel_requested,
+        'run_after': job.run_after.isoformat(),
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def job_file_path(name):
+    """
+    Resolve a file name given to a job inside JOB_FILES_DIR.
+    """
+    try:
+        return safe_join(settings.JOB_FILES_DIR, name)
+    except SuspiciousFileOperation:
+        raise JobError(f"{name} is outside the job files directory.")
+
+
+@task('rebuild_search_index')
+def rebuild_search_index_task(job):
+    return {'books': rebuild_search_index()}
+
+
+@task('rebuild_catalog')
+def rebuild_catalog_task(job):
+    count = rebuild_catalog_entries()
+    bump_catalog_version()
+    return {'entries': count}
+
+
+@task('reconcile_book_counts')
+def reconcile_book_counts_task(job, dry_run=False):
+    with transaction.atomic():
+        return reconcile_book_counts(dry_run=dry_run)
+
+
+@task('import_catalog')
+def import_catalog_task(job, authors=None, books=None, holdings=None, format=None, batch_size=1000):
+    # A retried import resumes from the previous attempt's checkpoint
+    options = {
+        'format': format, 'batch_size': batch_size, 'resume': True,
+        'checkpoint': job_file_path(f'import_catalog.{job.pk}.checkpoint.json'),
+    }
+    for section, name in (('authors', authors), ('books', books), ('holdings', holdings)):
+        if name:
+            options[section] = job_file_path(name)
+    report_progress(job, 0, "Importing")
+    output = StringIO()
+    call_command('import_catalog', stdout=output, stderr=output, **options)
+    return {'output': output.getvalue()}
+
+
+@task('export_books')
+def export_books_task(job, file, format='csv', author=None, library=None):
+    if format not in ('csv', 'ndjson'):
+        raise JobError("format must be csv or ndjson.")
+    books = filter_catalog(catalog_books(), author_id=author, library_id=library)
+    total = books.count()
+    chunk_size = settings.CATALOG_EXPORT_CHUNK_SIZE
+
+    def chunked_rows():
+        # Each chunk is read completely before report_progress() writes: on
+        # SQLite a write from a connection with an open read fails at once
+        # once another process has committed.
+        written, last_id = 0, 0
+        while ids := list(books.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]):
+            rows = list(iter_book_rows(books.filter(id__gt=last_id, id__lte=ids[-1]), chunk_size=chunk_size))
+            yield from rows
+            written, last_id = written + len(rows), ids[-1]
+            report_progress(job, 100 * written / total, f"{written} of {total} books")
+
+    path = job_file_path(file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        for line in (iter_csv if format == 'csv' else iter_ndjson)(chunked_rows()):
+            handle.write(line)
+    return {'file': file, 'books': total}
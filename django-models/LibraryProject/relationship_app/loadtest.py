@@ -0,0 +1,445 @@
+"""
+HTTP load generation and server process helpers for the
+benchmark_concurrency and loadtest management commands.
+
+The load generator is a plain asyncio HTTP/1.1 client: every simulated
+connection sends requests back to back for a fixed duration, reusing the
+socket while the server keeps it alive. run_load() hits a list of paths
+anonymously; run_mixed_load() simulates browsers with cookie jars going
+through realistic flows (browsing, logging in and editing books,
+registering), including sessions and CSRF tokens. Server memory is read
+from /proc, so it is only reported on Linux.
+"""
+
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+
+from .benchmarks import percentile
+
+# Command lines for each deployment; {host}, {port}, {workers} and {threads}
+# are filled in by start_server().
+SERVERS = {
+    'uvicorn': [
+        '-m', 'uvicorn', 'LibraryProject.asgi:application', '--host', '{host}', '--port', '{port}',
+        '--workers', '{workers}', '--no-access-log', '--log-level', 'warning',
+    ],
+    'gunicorn': [
+        '-m', 'gunicorn', 'LibraryProject.wsgi:application', '--bind', '{host}:{port}',
+        '--workers', '{workers}', '--threads', '{threads}', '--log-level', 'warning',
+    ],
+}
+
+
+@contextmanager
+def temporary_database(path):
+    """
+    Point the default connection at a fresh, migrated database file for
+    the duration of the block; the same switch as create_test_db(), so the
+    real database is never touched.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = settings.DATABASES[connection.alias]['NAME'] = path
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = settings.DATABASES[connection.alias]['NAME'] = old_name
+
+
+def free_port(host='127.0.0.1'):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, host, port, workers, threads, env=None):
+    """
+    Start one of SERVERS in the project directory and wait until it accepts
+    connections. Returns the Popen object.
+    """
+    args = [arg.format(host=host, port=port, workers=workers, threads=threads) for arg in SERVERS[name]]
+    env = {**os.environ, **(env or {})}
+    # Let asgi.py/wsgi.py pick their own settings module
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+    process = subprocess.Popen([sys.executable, *args], cwd=settings.BASE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited with status {process.returncode}")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f"{name} did not start listening on {host}:{port}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _children(pid):
+    try:
+        children = []
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as handle:
+                children += [int(child) for child in handle.read().split()]
+        return children
+    except OSError:
+        return []
+
+
+def process_tree_rss(pid):
+    """
+    Resident memory in bytes of a process and all its descendants, or None
+    where /proc is not available.
+    """
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as handle:
+                for line in handle:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            if current == pid:
+                return None
+            continue
+        pending += _children(current)
+    return total
+
+
+async def _read_response(reader, cookies=None):
+    """
+    Read one HTTP/1.1 response, storing any Set-Cookie values in cookies.
+    Returns (status, keep_alive, body).
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server.')
+    status = int(status_line.split()[1])
+    length, keep_alive, chunked = None, True, False
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value.lower() != 'close'
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value.lower()
+        elif name == 'set-cookie' and cookies is not None:
+            cookie, _, attributes = value.partition(';')
+            cookie_name, _, cookie_value = cookie.partition('=')
+            if cookie_value and 'max-age=0' not in attributes.lower().replace(' ', ''):
+                cookies[cookie_name.strip()] = cookie_value.strip()
+            else:
+                cookies.pop(cookie_name.strip(), None)
+    if chunked:
+        body = b''
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            body += (await reader.readexactly(size + 2))[:-2]
+        await reader.readline()
+    elif length is not None:
+        body = await reader.readexactly(length)
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, keep_alive, body
+
+
+async def _connection(host, port, paths, offset, deadline, latencies, errors):
+    reader = writer = None
+    index = offset
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            status, keep_alive, _ = await _read_response(reader)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errors.append('connection')
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        if status >= 400:
+            errors.append(status)
+        else:
+            latencies.append(time.perf_counter() - started)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _run_load(host, port, paths, connections, duration, on_tick):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    tasks = [
+        asyncio.create_task(_connection(host, port, paths, offset, deadline, latencies, errors))
+        for offset in range(connections)
+    ]
+    while not all(task.done() for task in tasks):
+        on_tick()
+        await asyncio.sleep(0.25)
+    for task in tasks:
+        task.result()
+    return latencies, errors
+
+
+def run_load(host, port, paths, connections, duration, on_tick=lambda: None):
+    """
+    Hit paths round-robin from connections concurrent connections for
+    duration seconds. on_tick() is called a few times a second (e.g. to
+    sample memory). Returns (successful latencies in seconds, errors).
+    """
+    return asyncio.run(_run_load(host, port, paths, connections, duration, on_tick))
+
+
+_CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+# Relative weights of the flows run by run_mixed_load()
+DEFAULT_MIX = {'browse': 80, 'edit': 15, 'register': 5}
+
+
+class Browser:
+    """
+    A simulated browser: one keep-alive connection and a cookie jar.
+    """
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def request(self, method, path, form=None):
+        """
+        Send one request (a urlencoded form for POST). Returns (status, body).
+        Redirects are not followed.
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = urlencode(form).encode() if form is not None else b''
+        headers = [f'{method} {path} HTTP/1.1', f'Host: {self.host}']
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if form is not None:
+            headers += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+        try:
+            self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+            status, keep_alive, response_body = await _read_response(self.reader, self.cookies)
+        except BaseException:
+            self.close()
+            raise
+        if not keep_alive:
+            self.close()
+        return status, response_body
+
+    async def csrf_token(self, path):
+        """
+        GET a form page and return (status, the form's CSRF token or None).
+        """
+        status, body = await self.request('GET', path)
+        match = _CSRF_INPUT_RE.search(body)
+        return status, match.group(1).decode() if match else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadStats:
+    """
+    Per-request samples of a mixed load run: (seconds since start, step,
+    latency in seconds or None, ok).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.samples = []
+
+    async def timed(self, step, request, expect=None):
+        """
+        Await request (returning (status, ...)) and record it, as an error
+        if the status is 4xx/5xx or isn't expect when given. Returns the
+        result, or None when the connection failed.
+        """
+        started = time.monotonic()
+        try:
+            result = await request
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self.samples.append((started - self.started, step, None, False))
+            return None
+        status = result[0]
+        ok = status == expect if expect is not None else status < 400
+        self.samples.append((started - self.started, step, time.monotonic() - started, ok))
+        return result
+
+    def summary(self, elapsed):
+        """
+        Return {step: stats} plus an 'all' entry, with requests/sec, error
+        rate and latency percentiles in milliseconds.
+        """
+        by_step = defaultdict(list)
+        for sample in self.samples:
+            by_step[sample[1]].append(sample)
+            by_step['all'].append(sample)
+        return {step: _stats(samples, elapsed) for step, samples in sorted(by_step.items())}
+
+    def timeline(self, interval):
+        """
+        Return one {'t', requests_per_sec, error_rate, p50/p95/p99} dict per
+        interval seconds of the run.
+        """
+        buckets = defaultdict(list)
+        for sample in self.samples:
+            buckets[int(sample[0] // interval)].append(sample)
+        return [
+            {'t': round(index * interval, 1), **_stats(buckets[index], interval)}
+            for index in range(max(buckets) + 1 if buckets else 0)
+        ]
+
+
+def _stats(samples, seconds):
+    latencies = sorted(sample[2] * 1000 for sample in samples if sample[3])
+    errors = sum(1 for sample in samples if not sample[3])
+    return {
+        'requests': len(samples),
+        'requests_per_sec': round(len(samples) / seconds, 1) if seconds else None,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'p50_ms': _round(percentile(latencies, 0.50) if latencies else None),
+        'p95_ms': _round(percentile(latencies, 0.95) if latencies else None),
+        'p99_ms': _round(percentile(latencies, 0.99) if latencies else None),
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+async def _browse(browser, site, stats, rng):
+    await stats.timed('list_books', browser.request('GET', site['list_books']))
+    library_url = site['library_detail'].format(rng.choice(site['library_ids']))
+    await stats.timed('library_detail', browser.request('GET', library_url))
+
+
+async def _edit(browser, site, stats, rng, account):
+    if 'sessionid' not in browser.cookies:
+        page = await stats.timed('login_form', browser.csrf_token(site['login']))
+        if page is None or page[1] is None:
+            return
+        form = {'csrfmiddlewaretoken': page[1], 'username': account[0], 'password': account[1]}
+        # A rejected login re-renders the form instead of redirecting
+        login = await stats.timed('login', browser.request('POST', site['login'], form), expect=302)
+        if login is None or login[0] != 302:
+            return
+    book_id, author_id = rng.choice(site['books'])
+    url = site['edit_book'].format(book_id)
+    page = await stats.timed('edit_form', browser.csrf_token(url))
+    if page is None or page[1] is None:
+        return
+    form = {'csrfmiddlewaretoken': page[1], 'title': f"Edited {uuid.uuid4().hex[:8]}", 'author': author_id}
+    await stats.timed('edit_book', browser.request('POST', url, form), expect=302)
+
+
+async def _register(site, stats, host, port):
+    # A new visitor, with an empty cookie jar
+    browser = Browser(host, port)
+    try:
+        page = await stats.timed('register_form', browser.csrf_token(site['register']))
+        if page is None or page[1] is None:
+            return
+        password = uuid.uuid4().hex
+        form = {
+            'csrfmiddlewaretoken': page[1], 'username': f"load-{uuid.uuid4().hex[:12]}",
+            'password1': password, 'password2': password,
+        }
+        await stats.timed('register', browser.request('POST', site['register'], form), expect=302)
+    finally:
+        browser.close()
+
+
+async def _virtual_user(index, host, port, site, mix, deadline, stats):
+    rng = random.Random(index)
+    browser = Browser(host, port)
+    account = site['accounts'][index % len(site['accounts'])] if site['accounts'] else None
+    if account is None:
+        # Without accounts the edit flow can't run; picking it would spin
+        mix = {flow: weight for flow, weight in mix.items() if flow != 'edit'}
+    if not any(mix.values()):
+        return
+    flows, weights = zip(*mix.items())
+    try:
+        while time.monotonic() < deadline:
+            flow = rng.choices(flows, weights)[0]
+            if flow == 'browse':
+                await _browse(browser, site, stats, rng)
+            elif flow == 'edit':
+                await _edit(browser, site, stats, rng, account)
+            elif flow == 'register':
+                await _register(site, stats, host, port)
+    finally:
+        browser.close()
+
+
+async def _run_mixed_load(host, port, site, clients, duration, mix, on_tick):
+    stats = LoadStats()
+    deadline = time.monotonic() + duration
+    tasks = [
+        asyncio.create_task(_virtual_user(index, host, port, site, mix, deadline, stats))
+        for index in range(clients)
+    ]
+    while not all(task.done() for task in tasks):
+        on_tick()
+        await asyncio.sleep(0.25)
+    for task in tasks:
+        task.result()
+    return stats
+
+
+def run_mixed_load(host, port, site, clients, duration, mix=None, on_tick=lambda: None):
+    """
+    Run clients simulated users for duration seconds, each repeatedly
+    picking a flow by the weights in mix (default DEFAULT_MIX):
+
+    - browse: list_books, then a random library_detail page, anonymously
+      unless the user has logged in before
+    - edit: log in once as one of site['accounts'], then load and submit
+      the edit_book form of a random book
+    - register: submit the registration form as a new visitor
+
+    site holds the URLs (library_detail and edit_book as '{}' templates),
+    'library_ids', 'books' as (book id, author id) pairs and 'accounts' as
+    (username, password) pairs. Returns the LoadStats.
+    """
+    return asyncio.run(_run_mixed_load(host, port, site, clients, duration, mix or DEFAULT_MIX, on_tick))
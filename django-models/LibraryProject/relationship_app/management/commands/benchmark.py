@@ -0,0 +1,113 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from relationship_app.benchmarks import SCALES, compare_results, generate_catalog, measure
+from relationship_app.models import Author, Book, Library
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the relationship_app views against a synthetic catalog in a throwaway "
+        "test database and report p50/p95/p99 latency and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help="Catalog size preset")
+        parser.add_argument('--books', type=int, help="Number of books (overrides --scale)")
+        parser.add_argument('--libraries', type=int, help="Number of libraries (overrides --scale)")
+        parser.add_argument('--density', type=float, default=0.1, help="Fraction of books held by each library")
+        parser.add_argument('--iterations', type=int, default=50, help="Timed requests per view")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results JSON to this file")
+        parser.add_argument('--baseline', help="Compare against a previous results JSON file")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p95 slowdown against the baseline")
+
+    def handle(self, *args, **options):
+        scale = dict(SCALES[options['scale']])
+        scale['books'] = options['books'] or scale['books']
+        scale['libraries'] = options['libraries'] or scale['libraries']
+
+        # Never touch the real database: run against a fresh test database.
+        # DEBUG is off so query logging doesn't skew the timings.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                self.stdout.write(f"Generating {scale['books']} books in {scale['libraries']} libraries...")
+                catalog = generate_catalog(
+                    scale['books'], scale['libraries'], options['density'], seed=options['seed']
+                )
+                views = self.run_benchmarks(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'density': options['density'],
+                'iterations': options['iterations'],
+                **catalog,
+            },
+            'views': views,
+        }
+
+        for name, stats in views.items():
+            self.stdout.write(
+                f"{name:<24} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                f"p99 {stats['p99_ms']:>9.2f}ms  queries {stats['queries']}"
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as handle:
+                regressions = compare_results(results, json.load(handle), options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run_benchmarks(self, iterations):
+        client = Client()
+        client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', None))
+
+        list_url = reverse('relationship_app:list_books')
+        middle_title = Book.objects.order_by('title', 'id').values_list('title', flat=True)[Book.objects.count() // 2]
+        deep_cursor = client.get(list_url, {'format': 'json'}).json()['next']
+        library = Library.objects.order_by('id').first()
+        author = Author.objects.order_by('id').first()
+        book = Book.objects.order_by('id').first()
+
+        def new_book(_=None):
+            return Book.objects.create(title=f"Benchmark {middle_title}", author=author)
+
+        requests = {
+            'list_books': lambda _: client.get(list_url),
+            'list_books_next_page': lambda _: client.get(list_url, {'cursor': deep_cursor}),
+            'library_detail': lambda _: client.get(reverse('relationship_app:library_detail', args=[library.pk])),
+            'add_book': lambda _: client.post(
+                reverse('relationship_app:add_book'), {'title': "Benchmark", 'author': author.pk}
+            ),
+            'edit_book': lambda _: client.post(
+                reverse('relationship_app:edit_book', args=[book.pk]), {'title': book.title, 'author': author.pk}
+            ),
+            'delete_book': lambda created: client.post(reverse('relationship_app:delete_book', args=[created.pk])),
+        }
+        results = {}
+        for name, request in requests.items():
+            self.stdout.write(f"Timing {name}...")
+            setup = new_book if name == 'delete_book' else None
+            results[name] = measure(request, iterations, setup)
+        return results
@@ -0,0 +1,123 @@
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from relationship_app.benchmarks import generate_catalog, percentile
+from relationship_app.loadtest import (
+    SERVERS, free_port, process_tree_rss, run_load, start_server, stop_server, temporary_database,
+)
+from relationship_app.models import Library
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec, latency and memory of the ASGI (uvicorn, async views) and "
+        "WSGI (gunicorn) deployments under many concurrent connections, against a synthetic "
+        "catalog in a temporary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', choices=sorted(SERVERS), help="Server to test (default: all)")
+        parser.add_argument('--connections', type=int, default=128, help="Concurrent client connections")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds of load per server")
+        parser.add_argument('--workers', type=int, default=4, help="Server worker processes")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker")
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--libraries', type=int, default=10)
+        parser.add_argument('--path', action='append', help="Path to request (default: the catalog read views)")
+        parser.add_argument('--output', help="Write the results JSON to this file")
+
+    def handle(self, *args, **options):
+        servers = options['server'] or sorted(SERVERS)
+        missing = [name for name in servers if find_spec(name) is None]
+        if missing:
+            raise CommandError(f"Install {', '.join(missing)} to benchmark it.")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database = os.path.join(tmpdir, 'benchmark.sqlite3')
+            self.stdout.write(f"Generating {options['books']} books in {options['libraries']} libraries...")
+            paths = self.prepare_database(database, options)
+            results = {}
+            for name in servers:
+                results[name] = self.run_server(name, database, paths, options)
+
+        for name, stats in results.items():
+            memory = f"{stats['peak_rss_mib']:.0f} MiB" if stats['peak_rss_mib'] is not None else "n/a"
+            self.stdout.write(
+                f"{name:<9} {stats['requests_per_sec']:>9,.0f} req/s  p50 {stats['p50_ms']:>8.2f}ms  "
+                f"p99 {stats['p99_ms']:>8.2f}ms  errors {stats['errors']}  peak memory {memory}"
+            )
+        if options['output']:
+            report = {
+                'meta': {
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    'connections': options['connections'],
+                    'duration': options['duration'],
+                    'workers': options['workers'],
+                    'threads': options['threads'],
+                    'paths': paths,
+                },
+                'servers': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def prepare_database(self, path, options):
+        """
+        Migrate and fill a fresh database file; returns the paths to request.
+        """
+        with temporary_database(path):
+            generate_catalog(options['books'], options['libraries'])
+            library = Library.objects.order_by('id').first()
+            return options['path'] or [
+                reverse('relationship_app:list_books'),
+                reverse('relationship_app:library_detail', args=[library.pk]),
+                reverse('relationship_app:search_books') + '?q=book',
+            ]
+
+    def run_server(self, name, database, paths, options):
+        host, port = '127.0.0.1', free_port()
+        self.stdout.write(f"Starting {name}...")
+        process = start_server(
+            name, host, port, options['workers'], options['threads'], env={'DJANGO_DATABASE_PATH': database},
+        )
+        try:
+            # Warm up every worker before measuring
+            run_load(host, port, paths, options['connections'], 1.0)
+            peak = [process_tree_rss(process.pid)]
+
+            def sample_memory():
+                rss = process_tree_rss(process.pid)
+                if rss is not None:
+                    peak[0] = max(peak[0] or 0, rss)
+
+            self.stdout.write(f"Running {options['connections']} connections for {options['duration']}s...")
+            started = time.monotonic()
+            latencies, errors = run_load(
+                host, port, paths, options['connections'], options['duration'], sample_memory
+            )
+            elapsed = time.monotonic() - started
+        finally:
+            stop_server(process)
+
+        if not latencies:
+            raise CommandError(f"{name}: no successful requests ({len(errors)} errors).")
+        latencies = sorted(latency * 1000 for latency in latencies)
+        return {
+            'requests': len(latencies),
+            'requests_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'errors': len(errors),
+            'peak_rss_mib': round(peak[0] / 2**20, 1) if peak[0] is not None else None,
+        }
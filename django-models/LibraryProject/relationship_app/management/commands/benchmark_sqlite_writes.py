@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+
+import django
+
+from django.core.management.base import BaseCommand
+
+from relationship_app.benchmarks import sqlite_write_worker
+
+VARIANTS = {
+    'stock': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {},
+    },
+    'tuned': {
+        'ENGINE': 'LibraryProject.sqlite_backend',
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare write throughput of the stock sqlite3 backend and the tuned WAL backend "
+        "with several worker processes writing to the same database file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        workers, seconds = options['workers'], options['seconds']
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, variant in VARIANTS.items():
+                path = os.path.join(tmpdir, f'{name}.sqlite3')
+                with sqlite3.connect(path) as conn:
+                    conn.execute(
+                        "CREATE TABLE bench_book (id INTEGER PRIMARY KEY, title TEXT, author_id INTEGER)"
+                    )
+                    conn.execute("CREATE INDEX bench_book_author ON bench_book (author_id)")
+                    if name == 'tuned':
+                        # Done once by the 0012_enable_wal migration for the real database
+                        conn.execute("PRAGMA journal_mode = WAL")
+                database = {**variant, 'NAME': path}
+                with context.Pool(workers, initializer=django.setup) as pool:
+                    results = pool.starmap(
+                        sqlite_write_worker, [(database, seconds, worker_id) for worker_id in range(workers)]
+                    )
+                commits = sum(result[0] for result in results)
+                errors = sum(result[1] for result in results)
+                self.stdout.write(
+                    f"{name:<6} {workers} workers: {commits / seconds:>9,.0f} commits/sec, "
+                    f"{errors} 'database is locked' errors"
+                )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from relationship_app.cache import bump_catalog_version
+from relationship_app.catalog import check_catalog_entries, refresh_catalog_entries
+
+
+class Command(BaseCommand):
+    help = "Compare the CatalogEntry table with the source tables and report (or repair) drifted entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Refresh the drifted entries")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Books read per query")
+
+    def handle(self, *args, **options):
+        problems = check_catalog_entries(chunk_size=options['chunk_size'])
+        for kind, book_ids in problems.items():
+            sample = f" (e.g. {', '.join(map(str, book_ids[:10]))})" if book_ids else ""
+            self.stdout.write(f"{kind}: {len(book_ids)} entries{sample}")
+        drifted = [book_id for book_ids in problems.values() for book_id in book_ids]
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("The catalog table is consistent."))
+        elif options['repair']:
+            with transaction.atomic():
+                refresh_catalog_entries(drifted)
+            bump_catalog_version()
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(drifted)} entries."))
+        else:
+            raise CommandError("The catalog table has drifted; run with --repair or rebuild_catalog.")
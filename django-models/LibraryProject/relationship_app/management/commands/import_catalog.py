@@ -0,0 +1,180 @@
+import csv
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from relationship_app.cache import bump_catalog_version
+from relationship_app.catalog import rebuild_catalog_entries
+from relationship_app.counters import reconcile_book_counts
+from relationship_app.models import Author, Book, Library
+from relationship_app.search import index_books
+
+
+def read_rows(path, file_format=None):
+    """
+    Stream rows from a CSV (with header) or NDJSON file as dicts.
+    """
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(rows, size):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def clean(value):
+    return ' '.join(str(value or '').split())
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream authors, books and library holdings from CSV/NDJSON files into the catalog "
+        "in bounded batches. Progress is checkpointed so a failed import can be resumed."
+    )
+
+    sections = ('authors', 'books', 'holdings')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', help="File with a 'name' column")
+        parser.add_argument('--books', help="File with 'title' and 'author' columns")
+        parser.add_argument('--holdings', help="File with 'library', 'title' and 'author' columns")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Input format (default: by file extension)")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: import_catalog.checkpoint.json)")
+        parser.add_argument('--resume', action='store_true', help="Skip rows already imported by a previous run")
+
+    def handle(self, *args, **options):
+        if not any(options[section] for section in self.sections):
+            raise CommandError("Pass at least one of --authors, --books or --holdings.")
+
+        self.batch_size = options['batch_size']
+        self.checkpoint_path = options['checkpoint'] or 'import_catalog.checkpoint.json'
+        self.progress = {}
+        if options['resume'] and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as handle:
+                self.progress = json.load(handle)
+
+        # In-memory natural key -> id maps, so rows never need per-row lookups.
+        # Author names are unique ignoring case, so they are keyed lowercased.
+        self.author_ids = {name.lower(): author_id for name, author_id in Author.objects.values_list('name', 'id').iterator()}
+        self.library_ids = dict(Library.objects.values_list('name', 'id').iterator())
+        self.book_ids = None
+
+        for section in self.sections:
+            if options[section]:
+                rows = read_rows(options[section], options['format'])
+                self.import_section(section, rows, getattr(self, f'import_{section}'))
+        # Bulk inserts skip the signal receivers
+        with transaction.atomic():
+            reconcile_book_counts()
+        rebuild_catalog_entries(chunk_size=self.batch_size)
+        bump_catalog_version()
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def import_section(self, section, rows, import_batch):
+        done = self.progress.get(section, 0)
+        if done:
+            self.stdout.write(f"{section}: resuming after row {done}")
+        rows = itertools.islice(rows, done, None)
+
+        started = time.monotonic()
+        processed = 0
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                import_batch(batch)
+            processed += len(batch)
+            self.save_checkpoint(section, done + processed)
+            rate = processed / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"{section}: {done + processed} rows ({rate:,.0f} rows/sec)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{section}: imported {processed} rows in {elapsed:.1f}s "
+            f"({processed / max(elapsed, 1e-9):,.0f} rows/sec)"
+        ))
+
+    def save_checkpoint(self, section, rows_done):
+        self.progress[section] = rows_done
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(self.progress, handle)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def resolve_authors(self, names):
+        """
+        Return author ids for the given names, creating missing authors in bulk.
+        """
+        missing = {name.lower(): name for name in names if name.lower() not in self.author_ids}
+        if missing:
+            Author.objects.bulk_create([Author(name=name) for name in sorted(missing.values())])
+            # Re-read ids rather than relying on the backend returning them
+            created = Author.objects.filter(name__in=missing.values()).values_list('name', 'id')
+            self.author_ids.update((name.lower(), author_id) for name, author_id in created)
+        return [self.author_ids[name.lower()] for name in names]
+
+    def load_book_ids(self):
+        if self.book_ids is None:
+            self.book_ids = {
+                (author_id, title): book_id
+                for book_id, author_id, title in Book.objects.values_list('id', 'author_id', 'title').iterator()
+            }
+        return self.book_ids
+
+    def import_authors(self, batch):
+        self.resolve_authors([clean(row['name']) for row in batch if clean(row.get('name'))])
+
+    def import_books(self, batch):
+        book_ids = self.load_book_ids()
+        rows = [(clean(row.get('title')), clean(row.get('author'))) for row in batch]
+        rows = [(title, author) for title, author in rows if title and author]
+        author_ids = self.resolve_authors([author for _, author in rows])
+
+        new_books = {}
+        for (title, _), author_id in zip(rows, author_ids):
+            if (author_id, title) not in book_ids:
+                new_books[(author_id, title)] = Book(title=title, author_id=author_id)
+        created = Book.objects.bulk_create(new_books.values())
+        if any(book.pk is None for book in created):
+            created = Book.objects.filter(
+                author_id__in={author_id for author_id, _ in new_books},
+                title__in={title for _, title in new_books},
+            )
+        book_ids.update(((book.author_id, book.title), book.id) for book in created)
+        # bulk_create skips the signal receivers, so index the new books here
+        index_books(book.id for book in created)
+
+    def import_holdings(self, batch):
+        book_ids = self.load_book_ids()
+        missing_libraries = {clean(row.get('library')) for row in batch} - set(self.library_ids) - {''}
+        if missing_libraries:
+            Library.objects.bulk_create([Library(name=name) for name in sorted(missing_libraries)])
+            self.library_ids.update(Library.objects.filter(name__in=missing_libraries).values_list('name', 'id'))
+
+        Holding = Library.books.through
+        holdings, skipped = {}, 0
+        for row in batch:
+            library_id = self.library_ids.get(clean(row.get('library')))
+            author_id = self.author_ids.get(clean(row.get('author')).lower())
+            book_id = book_ids.get((author_id, clean(row.get('title'))))
+            if library_id is None or book_id is None:
+                skipped += 1
+                continue
+            holdings[(library_id, book_id)] = Holding(library_id=library_id, book_id=book_id)
+        # Write the through table directly; existing holdings are left alone
+        Holding.objects.bulk_create(holdings.values(), ignore_conflicts=True)
+        if skipped:
+            self.stderr.write(f"holdings: skipped {skipped} rows with an unknown library or book")
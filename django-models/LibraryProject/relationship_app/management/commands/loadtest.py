@@ -0,0 +1,157 @@
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib.util import find_spec
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from relationship_app.benchmarks import generate_catalog
+from relationship_app.loadtest import (
+    DEFAULT_MIX, SERVERS, free_port, process_tree_rss, run_mixed_load, start_server, stop_server,
+    temporary_database,
+)
+from relationship_app.models import Book, Library
+from relationship_app.services import provision_users
+
+LIBRARIAN_PASSWORD = 'load-test-librarian'
+
+
+def parse_mix(value):
+    """
+    Parse "browse=80,edit=15,register=5" into a {flow: weight} dict.
+    """
+    mix = {}
+    for part in value.split(','):
+        flow, _, weight = part.partition('=')
+        if flow.strip() not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise CommandError(f"Invalid --mix entry {part!r}; flows are {', '.join(DEFAULT_MIX)}.")
+        mix[flow.strip()] = int(weight)
+    if not any(mix.values()):
+        raise CommandError("--mix needs at least one non-zero weight.")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive mixed, realistic traffic (anonymous browsing, librarian logins and edits, "
+        "registrations) against the app served by gunicorn (WSGI) or uvicorn (ASGI) with N "
+        "worker processes, and report throughput, latency percentiles and error rates per "
+        "flow step and over time. Runs against a synthetic catalog in a temporary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=sorted(SERVERS), default='gunicorn')
+        parser.add_argument('--workers', type=int, default=4, help="Server worker processes")
+        parser.add_argument('--threads', type=int, default=8, help="Threads per gunicorn worker")
+        parser.add_argument('--clients', type=int, default=64, help="Concurrent simulated users")
+        parser.add_argument('--duration', type=float, default=30.0, help="Seconds of load")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds per timeline row")
+        parser.add_argument(
+            '--mix', type=parse_mix, default=DEFAULT_MIX,
+            help="Flow weights (default: %s)" % ','.join(f'{flow}={weight}' for flow, weight in DEFAULT_MIX.items()),
+        )
+        parser.add_argument('--librarians', type=int, default=8, help="Librarian accounts shared by the clients")
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--libraries', type=int, default=10)
+        parser.add_argument('--output', help="Write the results JSON to this file")
+
+    def handle(self, *args, **options):
+        if find_spec(options['server']) is None:
+            raise CommandError(f"Install {options['server']} to load test it.")
+        if options['librarians'] < 1 and not any(weight for flow, weight in options['mix'].items() if flow != 'edit'):
+            raise CommandError("The edit flow needs librarian accounts; pass --librarians 1 or more, or add other flows to --mix.")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database = os.path.join(tmpdir, 'loadtest.sqlite3')
+            self.stdout.write(f"Generating {options['books']} books in {options['libraries']} libraries...")
+            site = self.prepare_database(database, options)
+            stats, elapsed, peak = self.run(database, site, options)
+
+        summary = stats.summary(elapsed)
+        timeline = stats.timeline(options['interval'])
+        self.write_table("step", summary.items())
+        self.stdout.write("")
+        self.write_table("t (s)", ((f"{row['t']:g}", row) for row in timeline))
+        if peak is not None:
+            self.stdout.write(f"\nPeak server memory: {peak / 2**20:.0f} MiB")
+        if options['output']:
+            report = {
+                'meta': {
+                    'timestamp': datetime.now(timezone.utc).isoformat(),
+                    'python': platform.python_version(),
+                    **{key: options[key] for key in ('server', 'workers', 'threads', 'clients', 'duration', 'mix')},
+                },
+                'summary': summary,
+                'timeline': timeline,
+                'peak_rss_mib': round(peak / 2**20, 1) if peak is not None else None,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def prepare_database(self, path, options):
+        """
+        Migrate and fill a fresh database file, with librarian accounts
+        allowed to edit books. Returns the site description for
+        run_mixed_load().
+        """
+        with temporary_database(path):
+            generate_catalog(options['books'], options['libraries'])
+            librarians = provision_users(
+                {'username': f"librarian{i:03d}", 'password': LIBRARIAN_PASSWORD, 'role': 'Librarian'}
+                for i in range(options['librarians'])
+            )
+            change_book = Permission.objects.get(content_type__app_label='relationship_app', codename='can_change_book')
+            change_book.user_set.add(*librarians)
+            return {
+                'list_books': reverse('relationship_app:list_books'),
+                'library_detail': reverse('relationship_app:library_detail', args=[0]).replace('/0/', '/{}/'),
+                'edit_book': reverse('relationship_app:edit_book', args=[0]).replace('/0/', '/{}/'),
+                'login': reverse('relationship_app:login'),
+                'register': reverse('relationship_app:register'),
+                'library_ids': list(Library.objects.values_list('id', flat=True)),
+                'books': list(Book.objects.order_by('?').values_list('id', 'author_id')[:1000]),
+                'accounts': [(user.username, LIBRARIAN_PASSWORD) for user in librarians],
+            }
+
+    def run(self, database, site, options):
+        host, port = '127.0.0.1', free_port()
+        self.stdout.write(f"Starting {options['server']} with {options['workers']} workers...")
+        process = start_server(
+            options['server'], host, port, options['workers'], options['threads'],
+            env={'DJANGO_DATABASE_PATH': database},
+        )
+        try:
+            peak = [process_tree_rss(process.pid)]
+
+            def sample_memory():
+                rss = process_tree_rss(process.pid)
+                if rss is not None:
+                    peak[0] = max(peak[0] or 0, rss)
+
+            self.stdout.write(f"Running {options['clients']} clients for {options['duration']}s...")
+            started = time.monotonic()
+            stats = run_mixed_load(
+                host, port, site, options['clients'], options['duration'], options['mix'], sample_memory,
+            )
+            elapsed = time.monotonic() - started
+        finally:
+            stop_server(process)
+        return stats, elapsed, peak[0]
+
+    def write_table(self, label, rows):
+        self.stdout.write(f"{label:<15} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<15} {row['requests']:>9,} {row['requests_per_sec'] or 0:>8,.1f} "
+                f"{row['error_rate']:>7.1%} {_ms(row['p50_ms'])} {_ms(row['p95_ms'])} {_ms(row['p99_ms'])}"
+            )
+
+
+def _ms(value):
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
@@ -0,0 +1,18 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from relationship_app.services import provision_users
+
+
+class Command(BaseCommand):
+    help = "Create users and their profiles in bulk from a CSV file with username,email,password,role columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8') as handle:
+            users = provision_users(csv.DictReader(handle), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Provisioned {len(users)} users."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from relationship_app.cache import bump_catalog_version
+from relationship_app.catalog import rebuild_catalog_entries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized CatalogEntry table from the Book, Author and holdings tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Books read and written per query")
+
+    def handle(self, *args, **options):
+        count = rebuild_catalog_entries(chunk_size=options['chunk_size'])
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} catalog entries."))
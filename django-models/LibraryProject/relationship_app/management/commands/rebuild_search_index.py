@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from relationship_app.search import rebuild_search_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over book titles and author names."
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            self.stdout.write("The search index is only used on SQLite; nothing to rebuild.")
+            return
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} books."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from relationship_app.counters import reconcile_book_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized Library.book_count and Author.book_count columns where they drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows drifted")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_book_counts(dry_run=options['dry_run'])
+        verb = "drifted" if options['dry_run'] else "fixed"
+        for model_name, rows in fixed.items():
+            self.stdout.write(f"{model_name}: {rows} rows {verb}")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS("Book counts are consistent."))
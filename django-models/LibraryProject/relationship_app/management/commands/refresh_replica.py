@@ -0,0 +1,55 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_database(source_path, target_path, pages=-1):
+    """
+    Copy a live SQLite database into another file with the online backup API.
+    Readers of the target keep working; they see the new copy once it is done.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, sleep=0.05)
+    finally:
+        target.close()
+        source.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the read replicas (REPLICA_DATABASES), "
+        "once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', help="Replica alias to refresh (default: all replicas)")
+        parser.add_argument('--interval', type=float, help="Keep refreshing every this many seconds")
+        parser.add_argument(
+            '--pages', type=int, default=-1,
+            help="Pages copied per backup step; smaller steps hold the primary's read lock for less time",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['database'] or settings.REPLICA_DATABASES
+        if not aliases:
+            raise CommandError("No replicas configured; set DJANGO_REPLICA_DATABASES.")
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if alias not in settings.DATABASES:
+                raise CommandError(f"Unknown database alias '{alias}'.")
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"'{alias}' is not a SQLite database; use the database's own replication.")
+
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        while True:
+            for alias in aliases:
+                started = time.monotonic()
+                copy_database(source, connections[alias].settings_dict['NAME'], options['pages'])
+                self.stdout.write(f"Refreshed {alias} in {time.monotonic() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+
+from django.core.management.base import BaseCommand
+
+from relationship_app.cache import get_card_cache_alias, is_process_local
+from relationship_app.jobs import (
+    claim_next_job, record_failure, recover_orphaned_jobs, release_claim, run_job, worker_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (imports, exports, reindexing, counter reconciliation) "
+        "in a pool of local worker processes, outside the request workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help="Worker processes (default: one per CPU; 0 runs jobs in this process)",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between queue polls when idle")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due and all claimed jobs finished")
+
+    def handle(self, *args, **options):
+        self.worker = worker_name()
+        self.check_shared_caches()
+        recovered = recover_orphaned_jobs()
+        if recovered:
+            self.stdout.write(f"Recovered {recovered} jobs left running by exited workers.")
+        self.stdout.write(f"Worker {self.worker} running jobs with {options['processes'] or 'no'} processes.")
+        try:
+            if options['processes']:
+                self.run_pool(options['processes'], options['poll_interval'], options['once'])
+            else:
+                self.run_inline(options['poll_interval'], options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def check_shared_caches(self):
+        # Catalog versions live in the database, but anything else a job
+        # writes to a process-local cache never reaches the web workers
+        local = sorted({alias for alias in ('default', get_card_cache_alias()) if is_process_local(alias)})
+        if local:
+            self.stderr.write(self.style.WARNING(
+                f"Process-local cache (LocMemCache) configured for {', '.join(local)}: cache entries "
+                "written by jobs are not seen by the web workers. Configure a shared cache backend."
+            ))
+
+    def run_inline(self, poll_interval, once):
+        while True:
+            job_id = claim_next_job(self.worker)
+            if job_id is not None:
+                self.report(job_id, run_job(job_id))
+            elif once:
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def make_pool(self, processes):
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(processes, mp_context=context, initializer=django.setup)
+
+    def run_pool(self, processes, poll_interval, once):
+        # A worker process that dies (e.g. killed for memory) breaks the whole
+        # executor, so a broken pool is replaced instead of ending the command
+        while True:
+            with self.make_pool(processes) as pool:
+                try:
+                    self.feed_pool(pool, processes, poll_interval, once)
+                    return
+                except BrokenProcessPool:
+                    self.stderr.write("A worker process died; starting a new pool.")
+
+    def feed_pool(self, pool, processes, poll_interval, once):
+        running = {}
+        while True:
+            while len(running) < processes and (job_id := claim_next_job(self.worker)) is not None:
+                try:
+                    future = pool.submit(run_job, job_id)
+                except BrokenProcessPool:
+                    # The job never reached a process; the others died with the pool
+                    release_claim(job_id)
+                    for future in wait(running).done:
+                        self.finish(running[future], future)
+                    raise
+                running[future] = job_id
+            if once and not running:
+                return
+            if not running:
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                self.finish(running.pop(future), future)
+
+    def finish(self, job_id, future):
+        if future.exception() is not None:
+            # The worker process itself died; task errors are recorded by run_job
+            record_failure(job_id, f"Worker process failed: {future.exception()!r}")
+            self.report(job_id, 'crashed')
+        else:
+            self.report(job_id, future.result())
+
+    def report(self, job_id, status):
+        self.stdout.write(f"job {job_id}: {status}")
@@ -0,0 +1,281 @@
+"""
+Per-view request metrics in Prometheus text exposition format.
+
+MetricsMiddleware records, for every request, the latency, the number and
+total duration of SQL queries and the response size, labelled by URL name.
+Queries are counted by an execute wrapper installed on every database
+connection as it is opened, whatever its alias and thread, and attributed
+to the request through a context variable, which sync_to_async carries
+into the threads running the async views' ORM calls. Each thread writes to its own shard,
+so recording never takes a lock; the /metrics view sums the shards when it
+is scraped. The shards of threads that have exited are folded into one
+retired shard, whenever a new thread starts recording and on each scrape,
+so a server that keeps replacing its threads does not grow without bound.
+Counters are per process: with several worker processes each one reports
+its own totals.
+"""
+
+import contextvars
+import hmac
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_shards = {}
+_shards_lock = threading.Lock()
+_local = threading.local()
+_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+class _ViewStats:
+    __slots__ = (
+        'requests', 'latency_sum', 'latency_buckets', 'queries', 'sql_seconds',
+        'size_count', 'size_sum', 'size_buckets',
+    )
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.size_count = 0
+        self.size_sum = 0
+        self.size_buckets = [0] * (len(SIZE_BUCKETS) + 1)
+
+
+_retired = defaultdict(_ViewStats)
+
+
+def _merge(totals, shard):
+    for view, stats in shard.copy().items():
+        total = totals[view]
+        for status, count in stats.requests.copy().items():
+            total.requests[status] += count
+        total.latency_sum += stats.latency_sum
+        total.latency_buckets = [a + b for a, b in zip(total.latency_buckets, stats.latency_buckets)]
+        total.queries += stats.queries
+        total.sql_seconds += stats.sql_seconds
+        total.size_count += stats.size_count
+        total.size_sum += stats.size_sum
+        total.size_buckets = [a + b for a, b in zip(total.size_buckets, stats.size_buckets)]
+
+
+def _retire_dead_shards():
+    """
+    Fold the shards of exited threads into _retired. Called with
+    _shards_lock held; an exited thread no longer writes to its shard.
+    """
+    for thread in [thread for thread in _shards if not thread.is_alive()]:
+        _merge(_retired, _shards.pop(thread))
+
+
+def _get_shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        _local.shard = defaultdict(_ViewStats)
+        with _shards_lock:
+            _retire_dead_shards()
+            _shards[threading.current_thread()] = _local.shard
+        return _local.shard
+
+
+def _bucket_index(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+def record_request(view, status, duration, queries, sql_seconds, size=None):
+    """
+    Record one request in the current thread's shard.
+    """
+    stats = _get_shard()[view]
+    stats.requests[status] += 1
+    stats.latency_sum += duration
+    stats.latency_buckets[_bucket_index(LATENCY_BUCKETS, duration)] += 1
+    stats.queries += queries
+    stats.sql_seconds += sql_seconds
+    if size is not None:
+        stats.size_count += 1
+        stats.size_sum += size
+        stats.size_buckets[_bucket_index(SIZE_BUCKETS, size)] += 1
+
+
+def collect():
+    """
+    Sum all shards into a {view: _ViewStats} dict.
+    """
+    totals = defaultdict(_ViewStats)
+    with _shards_lock:
+        _retire_dead_shards()
+        _merge(totals, _retired)
+        for shard in _shards.values():
+            _merge(totals, shard)
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines, name, view, buckets, counts, total, count):
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{view="{view}"}} {total}')
+    lines.append(f'{name}_count{{view="{view}"}} {count}')
+
+
+def render_metrics():
+    """
+    Render the collected metrics in Prometheus text exposition format.
+    """
+    totals = sorted(collect().items())
+    lines = [
+        '# HELP django_http_requests_total Requests by view and status code.',
+        '# TYPE django_http_requests_total counter',
+    ]
+    for view, stats in totals:
+        for status, count in sorted(stats.requests.items()):
+            lines.append(f'django_http_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+    lines += [
+        '# HELP django_http_request_duration_seconds Request latency by view.',
+        '# TYPE django_http_request_duration_seconds histogram',
+    ]
+    for view, stats in totals:
+        _histogram(
+            lines, 'django_http_request_duration_seconds', _escape(view), LATENCY_BUCKETS,
+            stats.latency_buckets, stats.latency_sum, sum(stats.requests.values()),
+        )
+
+    lines += [
+        '# HELP django_sql_queries_total SQL queries issued by view.',
+        '# TYPE django_sql_queries_total counter',
+    ]
+    lines += [f'django_sql_queries_total{{view="{_escape(view)}"}} {stats.queries}' for view, stats in totals]
+    lines += [
+        '# HELP django_sql_duration_seconds_total Time spent in SQL queries by view.',
+        '# TYPE django_sql_duration_seconds_total counter',
+    ]
+    lines += [f'django_sql_duration_seconds_total{{view="{_escape(view)}"}} {stats.sql_seconds}' for view, stats in totals]
+
+    lines += [
+        '# HELP django_http_response_size_bytes Size of non-streaming responses by view.',
+        '# TYPE django_http_response_size_bytes histogram',
+    ]
+    for view, stats in totals:
+        _histogram(
+            lines, 'django_http_response_size_bytes', _escape(view), SIZE_BUCKETS,
+            stats.size_buckets, stats.size_sum, stats.size_count,
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and their total duration.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper passing queries to the current request's QueryRecorder.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # First in the list: connection.execute_wrapper() blocks pop the last
+    # wrapper on exit, and the connection may be opened inside one
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL and response size metrics for every request.
+    Should be the first entry in MIDDLEWARE so the whole stack is timed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request, response, duration, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        record_request(view, response.status_code, duration, recorder.count, recorder.seconds, size)
+
+
+def metrics_view(request):
+    """
+    Expose the collected metrics to scrapers sending METRICS_TOKEN as a
+    bearer token. The endpoint does not exist unless the token is set; the
+    client address is no use here, since behind a reverse proxy on the same
+    host every request comes from 127.0.0.1.
+    """
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
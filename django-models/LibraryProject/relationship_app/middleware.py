@@ -0,0 +1,20 @@
+"""
+Middleware for relationship_app.
+"""
+
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_role
+
+
+class UserRoleMiddleware(MiddlewareMixin):
+    """
+    Attach the user's role to the request as request.user_role.
+
+    The role is resolved lazily, at most once per request, from the shared
+    role cache. Must come after AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.user_role = SimpleLazyObject(lambda: get_user_role(request.user))
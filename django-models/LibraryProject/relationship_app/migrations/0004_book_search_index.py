@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 virtual table over book titles and author names (rowid = book id)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS relationship_app_booksearch USING fts5("
+        "title, author_name, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO relationship_app_booksearch (rowid, title, author_name) "
+        "SELECT b.id, b.title, a.name FROM relationship_app_book b "
+        "JOIN relationship_app_author a ON a.id = b.author_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS relationship_app_booksearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("relationship_app", "0003_alter_book_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_duplicate_authors(apps, schema_editor):
+    # Authors whose names differ only by case are merged into the oldest one
+    # before the case-insensitive unique constraint is added.
+    Author = apps.get_model("relationship_app", "Author")
+    Book = apps.get_model("relationship_app", "Book")
+    db_alias = schema_editor.connection.alias
+    keepers = {}
+    for author_id, name in (
+        Author.objects.using(db_alias).order_by("id").values_list("id", "name")
+    ):
+        keeper_id = keepers.setdefault(name.lower(), author_id)
+        if keeper_id != author_id:
+            Book.objects.using(db_alias).filter(author_id=author_id).update(
+                author_id=keeper_id
+            )
+            Author.objects.using(db_alias).filter(id=author_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("relationship_app", "0004_book_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(fields=["name"], name="relapp_author_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["title", "id"], name="relapp_book_title_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["author", "title"], name="relapp_book_author_title_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="library",
+            index=models.Index(fields=["name"], name="relapp_library_name_idx"),
+        ),
+        migrations.RunPython(merge_duplicate_authors, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="author",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="relapp_author_name_ci_unique",
+            ),
+        ),
+    ]
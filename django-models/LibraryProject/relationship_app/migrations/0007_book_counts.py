@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:33
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_book_counts(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Author = apps.get_model("relationship_app", "Author")
+    Book = apps.get_model("relationship_app", "Book")
+    Library = apps.get_model("relationship_app", "Library")
+    counters = (
+        (Library, Library.books.through, "library"),
+        (Author, Book, "author"),
+    )
+    for model, source, field in counters:
+        rows = (
+            source.objects.using(db_alias)
+            .filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+        )
+        count = Subquery(rows.annotate(count=Count("pk")).values("count"))
+        model.objects.using(db_alias).update(book_count=Coalesce(count, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("relationship_app", "0006_catalog_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="author",
+            name="book_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="library",
+            name="book_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_book_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:42
+
+import itertools
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def populate_catalog_entries(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Book = apps.get_model("relationship_app", "Book")
+    Library = apps.get_model("relationship_app", "Library")
+    CatalogEntry = apps.get_model("relationship_app", "CatalogEntry")
+    Holding = Library.books.through
+    rows = (
+        Book.objects.using(db_alias)
+        .order_by("id")
+        .values_list("id", "title", "author_id", "author__name")
+        .iterator(chunk_size=2000)
+    )
+    while chunk := list(itertools.islice(rows, 2000)):
+        holdings = defaultdict(list)
+        pairs = (
+            Holding.objects.using(db_alias)
+            .filter(book_id__in=[row[0] for row in chunk])
+            .order_by("library_id")
+            .values_list("book_id", "library_id")
+        )
+        for book_id, library_id in pairs:
+            holdings[book_id].append(library_id)
+        CatalogEntry.objects.using(db_alias).bulk_create(
+            CatalogEntry(
+                id=book_id,
+                title=title,
+                author_id=author_id,
+                author_name=author_name,
+                library_ids=(
+                    f",{','.join(map(str, holdings[book_id]))},"
+                    if holdings[book_id]
+                    else ""
+                ),
+            )
+            for book_id, title, author_id, author_name in chunk
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("relationship_app", "0007_book_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogEntry",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("title", models.CharField(max_length=200)),
+                ("author_id", models.BigIntegerField()),
+                ("author_name", models.CharField(max_length=100)),
+                ("library_ids", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["title", "id"], name="relapp_entry_title_id_idx"
+                    ),
+                    models.Index(fields=["author_id"], name="relapp_entry_author_idx"),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_catalog_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:10
+
+import itertools
+
+from django.db import migrations, models
+
+
+def populate_catalog_holdings(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Library = apps.get_model("relationship_app", "Library")
+    CatalogHolding = apps.get_model("relationship_app", "CatalogHolding")
+    pairs = (
+        Library.books.through.objects.using(db_alias)
+        .order_by("id")
+        .values_list("library_id", "book_id")
+        .iterator(chunk_size=2000)
+    )
+    while chunk := list(itertools.islice(pairs, 2000)):
+        CatalogHolding.objects.using(db_alias).bulk_create(
+            CatalogHolding(library_id=library_id, book_id=book_id)
+            for library_id, book_id in chunk
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("relationship_app", "0010_catalog_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogHolding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("library_id", models.BigIntegerField()),
+                ("book_id", models.BigIntegerField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["book_id"], name="relapp_holding_book_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("library_id", "book_id"),
+                        name="relapp_holding_library_book_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_catalog_holdings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # Only the tuned backend (LibraryProject.sqlite_backend) has enable_wal()
+    if hasattr(schema_editor.connection, "enable_wal"):
+        schema_editor.connection.enable_wal()
+
+
+class Migration(migrations.Migration):
+    # The journal mode can't be changed inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("relationship_app", "0011_catalog_holding"),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, migrations.RunPython.noop),
+    ]
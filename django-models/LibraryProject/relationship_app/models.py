@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -10,6 +12,18 @@ class Author(models.Model):
     Author model representing book authors.
     """
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized number of books by this author (see counters.py)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='relapp_author_name_idx'),
+        ]
+        constraints = [
+            # One author per name, ignoring case, so name lookups are unambiguous
+            models.UniqueConstraint(Lower('name'), name='relapp_author_name_ci_unique'),
+        ]
     
     def __str__(self):
         return self.name
@@ -20,6 +34,7 @@ class Book(models.Model):
     """
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         permissions = [
@@ -27,9 +42,22 @@ class Book(models.Model):
             ('can_change_book', 'Can change book'),
             ('can_delete_book', 'Can delete book'),
         ]
+        indexes = [
+            # Catalog ordering and keyset pagination on (title, id)
+            models.Index(fields=['title', 'id'], name='relapp_book_title_id_idx'),
+            # An author's books sorted by title, and import de-duplication
+            models.Index(fields=['author', 'title'], name='relapp_book_author_title_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored author so a reassignment can move the author counts
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        return instance
 
 class Library(models.Model):
     """
@@ -37,6 +65,14 @@ class Library(models.Model):
     """
     name = models.CharField(max_length=100)
     books = models.ManyToManyField(Book, related_name='libraries')
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized number of books held (see counters.py)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='relapp_library_name_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -51,6 +87,108 @@ class Librarian(models.Model):
     def __str__(self):
         return f"{self.name} - {self.library.name}"
 
+class CatalogEntry(models.Model):
+    """
+    Denormalized read model of a book: its title, author name and holding
+    library ids in a single row (see catalog.py). The holdings are also
+    stored as CatalogHolding rows, which library filters use.
+    """
+    # The Book id; no foreign key, entries are maintained by signals.py
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    author_id = models.BigIntegerField()
+    author_name = models.CharField(max_length=100)
+    # Holding library ids packed as ",1,4,7," ('' when not held anywhere)
+    library_ids = models.TextField(blank=True, default='')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['title', 'id'], name='relapp_entry_title_id_idx'),
+            models.Index(fields=['author_id'], name='relapp_entry_author_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} by {self.author_name}"
+
+class CatalogHolding(models.Model):
+    """
+    One row per catalog entry held by a library, so that a library's part
+    of the catalog is read through an index (see catalog.py).
+    """
+    # No foreign keys, rows are maintained with their CatalogEntry
+    library_id = models.BigIntegerField()
+    book_id = models.BigIntegerField()
+    
+    class Meta:
+        constraints = [
+            # Also the index library filters seek into, in book id order
+            models.UniqueConstraint(fields=['library_id', 'book_id'], name='relapp_holding_library_book_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['book_id'], name='relapp_holding_book_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Book {self.book_id} in library {self.library_id}"
+
+class CatalogVersion(models.Model):
+    """
+    The catalog version (see cache.py), in a single row so that every web
+    and job worker process sees the same one, whatever the cache backend.
+    """
+    version = models.BigIntegerField()
+    
+    def __str__(self):
+        return str(self.version)
+
+class Job(models.Model):
+    """
+    A background job, queued by the jobs endpoints and executed by the
+    run_workers management command (see jobs.py).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+    
+    name = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    # Percent done and a short note, reported by the running task
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not picked up before this time; pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    cancel_requested = models.BooleanField(default=False)
+    # "host:pid" of the run_workers process that claimed the job
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Workers look for queued jobs that are due
+            models.Index(fields=['status', 'run_after'], name='relapp_job_status_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
 class UserProfile(models.Model):
     """
     UserProfile model to extend Django's User model with role-based access control.
@@ -66,22 +204,59 @@ class UserProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.role}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+    
+    def get_changed_fields(self):
+        """
+        Return the names of fields changed since the profile was loaded,
+        or None if the profile was never loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [name for name, value in loaded.items() if getattr(self, name) != value]
 
 # Signal to automatically create UserProfile when User is created
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """
     Signal handler to automatically create a UserProfile when a new User is created.
+    Uses a single INSERT that ignores an already existing profile.
     """
-    if created:
-        UserProfile.objects.create(user=instance)
+    if created and not raw:
+        UserProfile.objects.bulk_create([UserProfile(user=instance)], ignore_conflicts=True)
+        # ignore_conflicts doesn't return the primary key, so don't leave the
+        # unsaved profile cached on the user
+        User.userprofile.related.delete_cached_value(instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created, update_fields=None, raw=False, **kwargs):
     """
     Signal handler to save the UserProfile when User is saved.
+    Only writes when a profile attached to the user has unsaved changes;
+    login's last_login update and untouched profiles cause no writes. A
+    user without a profile gets one (one SELECT when it already exists).
     """
-    if hasattr(instance, 'userprofile'):
-        instance.userprofile.save()
-    else:
-        UserProfile.objects.create(user=instance)
+    if created or raw:
+        return
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    profile = User.userprofile.related.get_cached_value(instance, default=None)
+    if profile is None:
+        profile, _ = UserProfile.objects.get_or_create(user=instance)
+        User.userprofile.related.set_cached_value(instance, profile)
+        return
+    changed = profile.get_changed_fields()
+    if changed is None:
+        profile.save()
+    elif changed:
+        profile.save(update_fields=changed)
@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination for relationship_app querysets.
+
+Instead of LIMIT/OFFSET, each page is fetched with a WHERE clause on the
+ordering columns of the last (or first) row of the previous page, so deep
+pages cost the same as the first one when the ordering is indexed.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a cursor cannot be decoded or does not match the ordering.
+    """
+
+
+def get_page_size(value=None):
+    """
+    Return the page size to use, clamped to CATALOG_MAX_PAGE_SIZE.
+    Falls back to CATALOG_PAGE_SIZE when value is missing or invalid.
+    """
+    default = getattr(settings, 'CATALOG_PAGE_SIZE', 20)
+    maximum = getattr(settings, 'CATALOG_MAX_PAGE_SIZE', 100)
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(values, direction='next'):
+    """
+    Encode the ordering values of a row into an opaque, URL-safe cursor.
+    """
+    payload = json.dumps({'d': direction, 'k': list(values)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _cursor_value_type(model, field):
+    """
+    Return the Python type a cursor value for an ordering column must have.
+    """
+    field = model._meta.pk if field == 'pk' else model._meta.get_field(field)
+    if isinstance(field, models.IntegerField):
+        return int
+    if isinstance(field, (models.CharField, models.TextField)):
+        return str
+    return (str, int, float)
+
+
+def decode_cursor(cursor, ordering, model=None):
+    """
+    Decode a cursor produced by encode_cursor().
+    Returns a (direction, values) tuple. Given the model, each value must
+    also have the type of its ordering column; a cursor is client input, so
+    a tampered one must not reach the query.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['k']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Malformed cursor.')
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Cursor does not match the ordering.')
+    for field, value in zip(ordering, values):
+        expected = (str, int, float) if model is None else _cursor_value_type(model, field)
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise InvalidCursor('Cursor does not match the ordering.')
+    return direction, values
+
+
+def _keyset_filter(ordering, values, lookup):
+    """
+    Build a >= x AND ((a > x) OR (a = x AND b > y) OR ...) for the given
+    ordering columns. The leading range on the first column lets the
+    database seek into an index on the ordering instead of scanning it.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        clause = Q(**{f'{field}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            clause &= Q(**{previous: value})
+        condition |= clause
+    inclusive = {'gt': 'gte', 'lt': 'lte'}[lookup]
+    return Q(**{f'{ordering[0]}__{inclusive}': values[0]}) & condition
+
+
+def _row_key(row, ordering):
+    if isinstance(row, dict):
+        return [row[field] for field in ordering]
+    return [getattr(row, field) for field in ordering]
+
+
+class KeysetPage:
+    """
+    A single page of results with cursors for the neighbouring pages.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _keyset_query(queryset, ordering, cursor, page_size):
+    """
+    Return (direction, cursor values, sliced queryset) for one page; the
+    queryset fetches one extra row to tell whether there is a further page.
+    """
+    direction, values = ('next', None)
+    if cursor:
+        direction, values = decode_cursor(cursor, ordering, queryset.model)
+    if direction == 'next':
+        if values is not None:
+            queryset = queryset.filter(_keyset_filter(ordering, values, 'gt'))
+        return direction, values, queryset.order_by(*ordering)[:page_size + 1]
+    queryset = queryset.filter(_keyset_filter(ordering, values, 'lt'))
+    descending = [f'-{field}' for field in ordering]
+    return direction, values, queryset.order_by(*descending)[:page_size + 1]
+
+
+def _keyset_page(rows, direction, values, ordering, page_size):
+    has_more = len(rows) > page_size
+    if direction == 'next':
+        rows = rows[:page_size]
+        has_next, has_previous = has_more, values is not None
+    else:
+        rows = rows[:page_size][::-1]
+        has_next, has_previous = True, has_more
+
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(_row_key(rows[-1], ordering), 'next')
+    if rows and has_previous:
+        previous_cursor = encode_cursor(_row_key(rows[0], ordering), 'prev')
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=None):
+    """
+    Return a KeysetPage of queryset ordered by the ascending, unique
+    combination of ordering columns (the last one should be the primary key).
+    Works with model querysets as well as .values() querysets.
+    """
+    ordering = tuple(ordering)
+    page_size = page_size or get_page_size()
+    direction, values, query = _keyset_query(queryset, ordering, cursor, page_size)
+    return _keyset_page(list(query), direction, values, ordering, page_size)
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=None):
+    """
+    Async version of paginate_keyset() for async views.
+    """
+    ordering = tuple(ordering)
+    page_size = page_size or get_page_size()
+    direction, values, query = _keyset_query(queryset, ordering, cursor, page_size)
+    return _keyset_page([row async for row in query], direction, values, ordering, page_size)
@@ -0,0 +1,63 @@
+"""
+Role resolution for role-based access control.
+
+A user's UserProfile.role is looked up once, kept in the shared cache and
+memoized on the user object, so role checks in views and decorators do not
+query UserProfile on every request. The cached value is dropped by the
+UserProfile signal receivers in signals.py whenever the role changes.
+
+Dropping it from a process-local cache (LocMemCache) would only reach the
+worker that made the change, leaving a demoted user's old role in the
+others for USER_ROLE_CACHE_TIMEOUT, so roles are then only memoized on
+the user object for the current request.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from LibraryProject.routers import use_primary
+
+from .cache import is_process_local
+from .models import UserProfile
+
+
+def _role_cache_key(user_id):
+    return f'relationship_app:user_role:{user_id}'
+
+
+def _load_role(user_id):
+    # From the primary: the role is cached, and a demotion must take effect
+    with use_primary():
+        return UserProfile.objects.filter(user_id=user_id).values_list('role', flat=True).first() or ''
+
+
+def get_user_role(user):
+    """
+    Return the role of the given user, or None for anonymous users and
+    users without a profile.
+    """
+    if not user.is_authenticated:
+        return None
+    try:
+        return user._relationship_role
+    except AttributeError:
+        pass
+
+    if is_process_local():
+        role = _load_role(user.pk)
+    else:
+        key = _role_cache_key(user.pk)
+        role = cache.get(key)
+        if role is None:
+            # Cache a missing profile as '' so it is not looked up again either
+            role = _load_role(user.pk)
+            cache.set(key, role, settings.USER_ROLE_CACHE_TIMEOUT)
+    user._relationship_role = role or None
+    return user._relationship_role
+
+
+def invalidate_user_role(user_id):
+    """
+    Forget the cached role of a user.
+    """
+    cache.delete(_role_cache_key(user_id))
@@ -0,0 +1,210 @@
+"""
+Full-text search over book titles and author names, and author name
+autocompletion.
+
+On SQLite the catalog is indexed in an FTS5 virtual table (created by
+migration 0004) whose rowid is the book id. The index is kept in sync by the
+Book/Author signal receivers in signals.py and can be rebuilt with
+``python manage.py rebuild_search_index``. Other database backends fall back
+to icontains lookups. Matches are read from the CatalogEntry read model
+when CATALOG_READ_MODEL is on (see catalog.py), from Book and Author
+otherwise.
+"""
+
+import re
+import string
+import sys
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Author, Book, CatalogEntry
+
+SEARCH_TABLE = 'relationship_app_booksearch'
+
+# Column weights for bm25(): title matches rank above author matches
+TITLE_WEIGHT = 10.0
+AUTHOR_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_ID_CHUNK_SIZE = 500
+
+
+def search_index_available(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """
+    Turn user input into an FTS5 query matching every term as a prefix.
+    Returns '' when the input has no searchable terms.
+    """
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def _book_select():
+    return (
+        f"SELECT b.id, b.title, a.name FROM {Book._meta.db_table} b "
+        f"JOIN {Author._meta.db_table} a ON a.id = b.author_id"
+    )
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), _ID_CHUNK_SIZE):
+        yield ids[start:start + _ID_CHUNK_SIZE]
+
+
+def index_books(book_ids):
+    """
+    (Re)index the given books.
+    """
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(book_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, author_name) "
+                f"{_book_select()} WHERE b.id IN ({placeholders})",
+                chunk,
+            )
+
+
+def index_author_books(author_id):
+    """
+    Reindex every book written by the given author.
+    """
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+            f"(SELECT id FROM {Book._meta.db_table} WHERE author_id = %s)",
+            [author_id],
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, author_name) {_book_select()} WHERE b.author_id = %s",
+            [author_id],
+        )
+
+
+def remove_books(book_ids):
+    """
+    Drop the given books from the index.
+    """
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(book_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+
+def rebuild_search_index():
+    """
+    Rebuild the whole index from the Book and Author tables.
+    Returns the number of indexed books.
+    """
+    if not search_index_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, title, author_name) {_book_select()}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def search_books(query, page=1, page_size=20):
+    """
+    Return (results, has_next) for one page of books matching query,
+    best matches first. Each result is an {'id', 'title', 'author'} dict.
+    """
+    offset = (page - 1) * page_size
+    read_model = settings.CATALOG_READ_MODEL
+    using = router.db_for_read(CatalogEntry if read_model else Book)
+    if search_index_available(using):
+        match = build_match_query(query)
+        if not match:
+            return [], False
+        if read_model:
+            source = f"JOIN {CatalogEntry._meta.db_table} b ON b.id = s.rowid"
+            columns = "b.id, b.title, b.author_name"
+        else:
+            source = (
+                f"JOIN {Book._meta.db_table} b ON b.id = s.rowid "
+                f"JOIN {Author._meta.db_table} a ON a.id = b.author_id"
+            )
+            columns = "b.id, b.title, a.name"
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT {columns} FROM {SEARCH_TABLE} s {source} "
+                f"WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY bm25({SEARCH_TABLE}, %s, %s), b.id LIMIT %s OFFSET %s",
+                [match, TITLE_WEIGHT, AUTHOR_WEIGHT, page_size + 1, offset],
+            )
+            rows = cursor.fetchall()
+    else:
+        terms = _TOKEN_RE.findall(query)
+        if not terms:
+            return [], False
+        if read_model:
+            books, author_field = CatalogEntry.objects.using(using), 'author_name'
+        else:
+            books, author_field = Book.objects.using(using), 'author__name'
+        for term in terms:
+            books = books.filter(Q(title__icontains=term) | Q(**{f'{author_field}__icontains': term}))
+        rows = list(books.order_by('title', 'id').values_list('id', 'title', author_field)[offset:offset + page_size + 1])
+
+    results = [{'id': book_id, 'title': title, 'author': author} for book_id, title, author in rows[:page_size]]
+    return results, len(rows) > page_size
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _lower_like_database(value, vendor):
+    # SQLite's LOWER() only folds ASCII letters, so "É" stays "É"
+    if vendor == 'sqlite':
+        return value.translate(_ASCII_LOWER)
+    return value.lower()
+
+
+def _prefix_upper_bound(prefix):
+    """
+    Return the smallest string that sorts after every string starting with
+    prefix, or None if prefix is only U+10FFFF characters.
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        # Surrogates can't be encoded, and no name contains one
+        code_point = 0xE000
+    return prefix[:-1] + chr(code_point)
+
+
+def autocomplete_authors(prefix, limit=10):
+    """
+    Return up to limit {'id', 'name'} dicts for the authors whose name
+    starts with prefix, ignoring case, in name order. The prefix becomes a
+    range on LOWER(name), which is read from the index behind Author's
+    case-insensitive unique constraint, so only matching rows are visited.
+    The prefix is lowercased the way the database's LOWER() does it.
+    """
+    vendor = connections[router.db_for_read(Author)].vendor
+    prefix = _lower_like_database(prefix.strip(), vendor)
+    if not prefix:
+        return []
+    # Every name starting with prefix sorts in [prefix, upper)
+    authors = Author.objects.annotate(lower_name=Lower('name')).filter(lower_name__gte=prefix)
+    upper = _prefix_upper_bound(prefix)
+    if upper is not None:
+        authors = authors.filter(lower_name__lt=upper)
+    authors = authors.order_by('lower_name')
+    return [{'id': author_id, 'name': name} for author_id, name in authors.values_list('id', 'name')[:limit]]
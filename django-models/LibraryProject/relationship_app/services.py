@@ -0,0 +1,122 @@
+"""
+Service functions for bulk operations on relationship_app data.
+
+These bypass per-instance model signals on purpose and keep related rows
+consistent themselves, so they stay cheap when run over many rows.
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+
+from .models import Book, Library, UserProfile
+from .signals import holdings_changed
+
+# Per-connection scratch table holding the book ids of a holdings sync
+HOLDINGS_STAGE_TABLE = 'relationship_app_holdings_stage'
+
+
+class UnknownBooks(ValueError):
+    """
+    Raised when a holdings sync names books that don't exist.
+    """
+
+    def __init__(self, book_ids):
+        self.book_ids = book_ids
+        super().__init__(f"Unknown books: {', '.join(map(str, book_ids))}.")
+
+
+def provision_users(accounts, batch_size=500):
+    """
+    Create users and their profiles in bulk.
+
+    accounts is an iterable of dicts with a 'username' and optional 'email',
+    'password' and 'role' keys. Users without a password get an unusable one.
+    Returns the list of created users.
+    """
+    users, roles = [], []
+    for account in accounts:
+        password = account.get('password')
+        users.append(User(
+            username=account['username'],
+            email=account.get('email', ''),
+            password=make_password(password) if password else make_password(None),
+        ))
+        roles.append(account.get('role') or 'Member')
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(users, batch_size=batch_size)
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role=role) for user, role in zip(users, roles)],
+            batch_size=batch_size,
+        )
+    return users
+
+
+def _stage_book_ids(cursor, keep, drop):
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {HOLDINGS_STAGE_TABLE} "
+        f"(book_id bigint PRIMARY KEY, keep boolean NOT NULL)"
+    )
+    cursor.execute(f"DELETE FROM {HOLDINGS_STAGE_TABLE}")
+    cursor.executemany(
+        f"INSERT INTO {HOLDINGS_STAGE_TABLE} (book_id, keep) VALUES (%s, %s)",
+        [(book_id, True) for book_id in keep] + [(book_id, False) for book_id in drop],
+    )
+
+
+def sync_library_holdings(library, book_ids=None, add=(), remove=()):
+    """
+    Bring a library's holdings to the given state in one transaction.
+
+    Pass book_ids for the full set of books the library should hold, or
+    add/remove for a delta. The ids are staged in a temporary table and
+    diffed against the through table in SQL, then applied with one
+    INSERT ... SELECT and one DELETE, however many books change. Instead
+    of an m2m_changed per row, a single holdings_changed signal is sent,
+    whose receivers update Library.book_count, the book cards and the
+    catalog version. Raises UnknownBooks (nothing is changed) if books to
+    hold don't exist. Returns (added, removed) lists of book ids.
+    """
+    full_sync = book_ids is not None
+    keep = set(book_ids if full_sync else add)
+    drop = set() if full_sync else set(remove)
+    if keep & drop:
+        raise ValueError("A book can't be both added and removed.")
+
+    through = Library.books.through._meta.db_table
+    books = Book._meta.db_table
+    stage = HOLDINGS_STAGE_TABLE
+    if full_sync:
+        removed_where = f"library_id = %s AND book_id NOT IN (SELECT book_id FROM {stage} WHERE keep)"
+    else:
+        removed_where = f"library_id = %s AND book_id IN (SELECT book_id FROM {stage} WHERE NOT keep)"
+    added_select = (
+        f"SELECT %s, book_id FROM {stage} WHERE keep "
+        f"AND book_id NOT IN (SELECT book_id FROM {through} WHERE library_id = %s)"
+    )
+
+    using = router.db_for_write(Library.books.through, instance=library)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        _stage_book_ids(cursor, keep, drop)
+        cursor.execute(
+            f"SELECT s.book_id FROM {stage} s LEFT JOIN {books} b ON b.id = s.book_id "
+            f"WHERE s.keep AND b.id IS NULL ORDER BY s.book_id LIMIT 20"
+        )
+        unknown = [row[0] for row in cursor.fetchall()]
+        if unknown:
+            raise UnknownBooks(unknown)
+
+        cursor.execute(f"SELECT book_id FROM {through} WHERE {removed_where} ORDER BY book_id", [library.pk])
+        removed = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"{added_select} ORDER BY book_id", [library.pk, library.pk])
+        added = [row[1] for row in cursor.fetchall()]
+        if removed:
+            cursor.execute(f"DELETE FROM {through} WHERE {removed_where}", [library.pk])
+        if added:
+            cursor.execute(f"INSERT INTO {through} (library_id, book_id) {added_select}", [library.pk, library.pk])
+        cursor.execute(f"DELETE FROM {stage}")
+
+        if added or removed:
+            holdings_changed.send(sender=Library, library=library, added=added, removed=removed, using=using)
+    return added, removed
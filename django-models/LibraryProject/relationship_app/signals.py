@@ -0,0 +1,277 @@
+"""
+Signal receivers keeping relationship_app caches, denormalized counters,
+the catalog read model, the search index and the cached permission sets in
+sync with the database.
+
+Connected from RelationshipAppConfig.ready().
+"""
+
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .cache import bump_book_card_versions, bump_catalog_version, bump_permissions_version
+from .catalog import refresh_catalog_entries, rename_author_entries
+from .counters import adjust_book_counts
+from .models import Author, Book, Librarian, Library, UserProfile
+from .roles import invalidate_user_role
+from .search import index_author_books, index_books, remove_books
+
+# Sent once by services.sync_library_holdings() for a whole batch of holdings
+# changes, instead of m2m_changed. Arguments: library, added and removed (lists
+# of book ids) and using.
+holdings_changed = Signal()
+
+
+def _bump_book_cards(book_ids):
+    """
+    Invalidate the cards of the given books right away and again on
+    commit. A concurrent request may read the first new version and render
+    the rows not yet committed over, and that card must not be kept.
+    """
+    book_ids = list(book_ids)
+    bump_book_card_versions(book_ids)
+    transaction.on_commit(partial(bump_book_card_versions, book_ids))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_card(sender, instance, **kwargs):
+    """
+    Invalidate the cached card of a saved or deleted book.
+    """
+    _bump_book_cards([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def invalidate_author_book_cards(sender, instance, created, **kwargs):
+    """
+    Invalidate the cards of every book written by a renamed author.
+    Deleting an author cascades to its books, which is handled per book.
+    """
+    if not created:
+        _bump_book_cards(instance.books.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def invalidate_holding_book_cards(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate the cards of books added to or removed from a library.
+    """
+    if reverse:
+        # book.libraries.add(...) and friends: only the one book changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _bump_book_cards([instance.pk])
+    elif action == 'pre_clear':
+        # The cleared book ids are only known before the rows are gone
+        _bump_book_cards(instance.books.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        _bump_book_cards(pk_set)
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Library)
+@receiver([post_save, post_delete], sender=Librarian)
+def invalidate_catalog(sender, **kwargs):
+    """
+    Change the catalog version used by the conditional GET validators.
+    """
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def invalidate_catalog_holdings(sender, action, **kwargs):
+    """
+    Change the catalog version when library holdings change.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def count_holdings(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """
+    Keep Library.book_count in step with library.books and book.libraries.
+
+    Only add reports just the rows it inserts, so the rows that remove and
+    clear will really delete are looked up in the pre_ step.
+    """
+    holdings = sender.objects.using(using)
+    own, other = ('book', 'library') if reverse else ('library', 'book')
+    if action == 'pre_remove':
+        instance._removed_holdings = list(
+            holdings.filter(**{own: instance.pk, f'{other}__in': pk_set}).values_list(other, flat=True)
+        )
+    elif action == 'pre_clear':
+        instance._removed_holdings = list(holdings.filter(**{own: instance.pk}).values_list(other, flat=True))
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop('_removed_holdings', [])
+        if reverse:
+            adjust_book_counts(Library, {library_id: -1 for library_id in removed})
+        else:
+            adjust_book_counts(Library, {instance.pk: -len(removed)})
+    elif action == 'post_add':
+        if reverse:
+            adjust_book_counts(Library, {library_id: 1 for library_id in pk_set})
+        else:
+            adjust_book_counts(Library, {instance.pk: len(pk_set)})
+
+
+@receiver(holdings_changed)
+def apply_holdings_changes(sender, library, added, removed, **kwargs):
+    """
+    Update the counter, catalog entries, book cards and catalog version
+    after a bulk sync.
+    """
+    adjust_book_counts(Library, {library.pk: len(added) - len(removed)})
+    refresh_catalog_entries(added + removed)
+    _bump_book_cards(added + removed)
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Book)
+def count_saved_book(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep Author.book_count in step with new books and author changes.
+    """
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_author_id', None)
+    if created:
+        adjust_book_counts(Author, {instance.author_id: 1})
+    elif previous is not None and previous != instance.author_id:
+        adjust_book_counts(Author, {previous: -1, instance.author_id: 1})
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(pre_delete, sender=Book)
+def collect_deleted_book_holdings(sender, instance, using, **kwargs):
+    """
+    Remember which libraries hold a book about to be deleted; the holdings
+    are removed by the delete cascade, which sends no m2m_changed.
+    """
+    instance._deleted_holdings = list(instance.libraries.using(using).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Book)
+def count_deleted_book(sender, instance, **kwargs):
+    """
+    Decrement the counters of a deleted book's author and libraries.
+    """
+    adjust_book_counts(Author, {instance.author_id: -1})
+    adjust_book_counts(Library, {library_id: -1 for library_id in instance.__dict__.pop('_deleted_holdings', [])})
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def refresh_book_entry(sender, instance, raw=False, **kwargs):
+    """
+    Refresh (or drop) the catalog entry of a saved or deleted book.
+    """
+    if not raw:
+        refresh_catalog_entries([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def rename_author_entry(sender, instance, created, raw=False, **kwargs):
+    """
+    Copy a renamed author's name onto their books' catalog entries.
+    """
+    if not created and not raw:
+        rename_author_entries(instance.pk, instance.name)
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def refresh_holding_entries(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Refresh the catalog entries of books added to or removed from a library.
+    """
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_catalog_entries([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_entry_books = list(instance.books.values_list('id', flat=True))
+    elif action == 'post_clear':
+        refresh_catalog_entries(instance.__dict__.pop('_cleared_entry_books', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_catalog_entries(pk_set)
+
+
+@receiver(pre_delete, sender=Library)
+def collect_deleted_library_books(sender, instance, using, **kwargs):
+    """
+    Remember the books of a library about to be deleted; its holdings are
+    removed by the delete cascade, which sends no m2m_changed.
+    """
+    instance._deleted_entry_books = list(instance.books.using(using).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Library)
+def refresh_deleted_library_entries(sender, instance, **kwargs):
+    """
+    Drop a deleted library from its books' catalog entries.
+    """
+    refresh_catalog_entries(instance.__dict__.pop('_deleted_entry_books', []))
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, raw=False, **kwargs):
+    """
+    Keep the full-text search index in sync with a saved book.
+    """
+    if not raw:
+        index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    """
+    Drop a deleted book from the full-text search index.
+    """
+    remove_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, raw=False, **kwargs):
+    """
+    Reindex the books of a renamed author.
+    """
+    if not created and not raw:
+        index_author_books(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_role(sender, instance, **kwargs):
+    """
+    Drop the cached role when a user's profile changes, right away and
+    again on commit, so a role cached from the old row by a concurrent
+    request before the commit is not kept.
+    """
+    invalidate_user_role(instance.user_id)
+    transaction.on_commit(partial(invalidate_user_role, instance.user_id))
+
+
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver([post_save, post_delete], sender=Permission)
+@receiver(post_delete, sender=Group)
+def invalidate_permissions(sender, action=None, **kwargs):
+    """
+    Change the permissions version when grants or group membership change.
+
+    Deleting a group removes its grants through the delete cascade, which
+    sends no m2m_changed. Deleting a user needs nothing, because cached
+    sets are keyed by date_joined and a new user given the same id never
+    reads them. The version is replaced right away and again on commit, so
+    a set cached from the old rows before the commit is not kept.
+    """
+    if action is None or action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permissions_version()
+        transaction.on_commit(bump_permissions_version)
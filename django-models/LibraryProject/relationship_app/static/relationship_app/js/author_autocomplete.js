@@ -0,0 +1,94 @@
+// Author picker used by BookForm (see relationship_app/widgets.py): suggests
+// authors from the autocomplete endpoint and keeps the chosen id in the
+// hidden input that is submitted with the form.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.author-autocomplete').forEach(function (picker) {
+        var input = picker.querySelector('input[type="text"]');
+        var value = picker.querySelector('input[type="hidden"]');
+        var list = picker.querySelector('.author-options');
+        var timer = null;
+        var latest = 0;
+        var active = -1;
+
+        function close() {
+            list.hidden = true;
+            list.innerHTML = '';
+            input.setAttribute('aria-expanded', 'false');
+            active = -1;
+        }
+
+        function choose(option) {
+            value.value = option.dataset.id;
+            input.value = option.textContent;
+            close();
+        }
+
+        function highlight(index) {
+            var options = list.querySelectorAll('li');
+            if (!options.length) {
+                return;
+            }
+            active = (index + options.length) % options.length;
+            options.forEach(function (option, i) {
+                option.setAttribute('aria-selected', i === active ? 'true' : 'false');
+            });
+        }
+
+        function show(authors) {
+            list.innerHTML = '';
+            authors.forEach(function (author) {
+                var option = document.createElement('li');
+                option.setAttribute('role', 'option');
+                option.dataset.id = author.id;
+                option.textContent = author.name;
+                option.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(option);
+                });
+                list.appendChild(option);
+            });
+            list.hidden = !authors.length;
+            input.setAttribute('aria-expanded', authors.length ? 'true' : 'false');
+            active = -1;
+        }
+
+        function suggest() {
+            var query = input.value.trim();
+            var request = ++latest;
+            if (!query) {
+                close();
+                return;
+            }
+            fetch(picker.dataset.url + '?q=' + encodeURIComponent(query) + '&limit=10')
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    // Ignore responses that arrive after a newer request
+                    if (request === latest) {
+                        show(data.results);
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            // Typing invalidates the previous choice until one is picked
+            value.value = '';
+            clearTimeout(timer);
+            timer = setTimeout(suggest, 150);
+        });
+
+        input.addEventListener('keydown', function (event) {
+            var options = list.querySelectorAll('li');
+            if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+                event.preventDefault();
+                highlight(active + (event.key === 'ArrowDown' ? 1 : -1));
+            } else if (event.key === 'Enter' && active >= 0 && options[active]) {
+                event.preventDefault();
+                choose(options[active]);
+            } else if (event.key === 'Escape') {
+                close();
+            }
+        });
+
+        input.addEventListener('blur', close);
+    });
+});
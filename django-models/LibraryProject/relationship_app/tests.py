@@ -1,3 +1,1343 @@
-from django.test import TestCase
+import base64
+import contextvars
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache, caches
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models.functions import Lower
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from LibraryProject.routers import PIN_COOKIE, ReplicaRouter
+
+from .benchmarks import compare_results, generate_catalog
+from .counters import reconcile_book_counts
+from .catalog import catalog_books, check_catalog_entries, filter_catalog, rebuild_catalog_entries
+from .cache import bump_catalog_version, get_book_card_versions, get_card_cache_alias, get_catalog_version
+from .management.commands import run_workers
+from .management.commands.refresh_replica import copy_database
+from . import metrics
+from .metrics import collect, record_queries, record_request
+from .loadtest import LoadStats
+from .jobs import TASKS, claim_next_job, enqueue, record_failure, report_progress, run_job, task
+from .models import Author, Book, CatalogEntry, CatalogHolding, Job, Library, Librarian, UserProfile
+from .pagination import _keyset_filter, encode_cursor
+from .search import rebuild_search_index
+from .services import UnknownBooks, provision_users, sync_library_holdings
+from .views import BookForm
 
 # Create your tests here.
+
+# A cache shared between processes, like Redis in production
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'relationship_app_test_cache'),
+    },
+}
+
+
+class ListBooksPaginationTests(TestCase):
+    """
+    Tests for the keyset (cursor) pagination of list_books.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="George Orwell")
+        # Duplicate titles make sure the id tie-breaker is honoured.
+        Book.objects.bulk_create(
+            [Book(title=f"Book {i // 2:02d}", author=author) for i in range(25)]
+        )
+        rebuild_catalog_entries()
+        cls.ordered_ids = list(Book.objects.order_by('title', 'id').values_list('id', flat=True))
+
+    def fetch(self, **params):
+        params['format'] = 'json'
+        return self.client.get(reverse('relationship_app:list_books'), params).json()
+
+    def test_pages_walk_forward_and_back(self):
+        first = self.fetch(page_size=10)
+        self.assertIsNone(first['previous'])
+        second = self.fetch(page_size=10, cursor=first['next'])
+        third = self.fetch(page_size=10, cursor=second['next'])
+        seen = [row['id'] for page in (first, second, third) for row in page['results']]
+        self.assertEqual(seen, self.ordered_ids)
+        self.assertIsNone(third['next'])
+
+        back = self.fetch(page_size=10, cursor=third['previous'])
+        self.assertEqual(back['results'], second['results'])
+
+    def test_page_size_is_clamped(self):
+        with self.settings(CATALOG_MAX_PAGE_SIZE=5):
+            self.assertEqual(len(self.fetch(page_size=50)['results']), 5)
+
+    def test_html_page_has_cursor_links(self):
+        response = self.client.get(reverse('relationship_app:list_books'), {'page_size': 10})
+        self.assertEqual(len(response.context['books']), 10)
+        self.assertContains(response, '?cursor=')
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('relationship_app:list_books'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_returns_404(self):
+        payload = base64.urlsafe_b64encode(json.dumps({'d': 'next', 'k': 5}).encode()).decode()
+        cursors = [
+            payload,
+            encode_cursor(['a', [1]]),
+            encode_cursor(['a', 'x']),
+            encode_cursor(['a', True]),
+            encode_cursor([1, 1]),
+            encode_cursor([None, None], 'prev'),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('relationship_app:list_books'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class LibraryDetailQueryCountTests(TestCase):
+    """
+    LibraryDetailView must render with a fixed number of queries.
+    """
+
+    def create_library(self, name, book_count):
+        library = Library.objects.create(name=name)
+        Librarian.objects.create(name=f"{name} Librarian", library=library)
+        authors = Author.objects.bulk_create(
+            [Author(name=f"{name} Author {i}") for i in range(10)]
+        )
+        books = Book.objects.bulk_create(
+            [Book(title=f"Title {i}", author=authors[i % 10]) for i in range(book_count)]
+        )
+        library.books.add(*books)
+        return library
+
+    def assert_detail_queries(self, library, expected_count):
+        url = reverse('relationship_app:library_detail', args=[library.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['books_count'], expected_count)
+        self.assertContains(response, f"{library.name} Librarian")
+        return len(queries)
+
+    def test_query_count_is_independent_of_library_size(self):
+        small = self.create_library("Small", 10)
+        large = self.create_library("Large", 10000)
+        small_queries = self.assert_detail_queries(small, 10)
+        large_queries = self.assert_detail_queries(large, 10000)
+        self.assertEqual(small_queries, large_queries)
+        # The catalog version row for the ETag, then the page's queries
+        self.assertLessEqual(small_queries, 3)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class BookCardCacheTests(TestCase):
+    """
+    Book cards are served from the fragment cache until the book changes.
+    """
+
+    def setUp(self):
+        caches[get_card_cache_alias()].clear()
+        self.author = Author.objects.create(name="Harper Lee")
+        self.book = Book.objects.create(title="To Kill a Mockingbird", author=self.author)
+        self.url = reverse('relationship_app:list_books')
+        self.client.get(self.url)
+
+    def test_unchanged_card_is_served_from_cache(self):
+        # A queryset update bypasses the signals, so the cached card stays
+        Book.objects.filter(pk=self.book.pk).update(title="Go Set a Watchman")
+        self.assertContains(self.client.get(self.url), "To Kill a Mockingbird")
+
+    def test_book_save_invalidates_card(self):
+        self.book.title = "Go Set a Watchman"
+        self.book.save()
+        self.assertContains(self.client.get(self.url), "Go Set a Watchman")
+
+    def test_author_save_invalidates_cards(self):
+        self.author.name = "Nelle Harper Lee"
+        self.author.save()
+        self.assertContains(self.client.get(self.url), "by Nelle Harper Lee")
+
+    def test_holdings_change_invalidates_card(self):
+        before = get_book_card_versions([self.book.pk])[self.book.pk]
+        Library.objects.create(name="Central Library").books.add(self.book)
+        self.assertNotEqual(get_book_card_versions([self.book.pk])[self.book.pk], before)
+
+    def test_card_version_changes_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "Go Set a Watchman"
+            self.book.save()
+            # What a concurrent request would cache the old row under
+            during = get_book_card_versions([self.book.pk])[self.book.pk]
+        self.assertNotEqual(get_book_card_versions([self.book.pk])[self.book.pk], during)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_follows_the_catalog_version(self):
+        # As when a job in another process rebuilt the catalog: only the
+        # shared catalog version tells this process its cards are stale
+        self.client.get(self.url)
+        Book.objects.filter(pk=self.book.pk).update(title="Go Set a Watchman")
+        rebuild_catalog_entries()
+        self.assertContains(self.client.get(self.url), "To Kill a Mockingbird")
+        bump_catalog_version()
+        self.assertContains(self.client.get(self.url), "Go Set a Watchman")
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class UserRoleCacheTests(TestCase):
+    """
+    Role checks read the cached role instead of querying UserProfile.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="secret-pass-123")
+        self.user.userprofile.role = 'Admin'
+        self.user.userprofile.save()
+        self.client.force_login(self.user)
+
+    def test_role_check_does_not_query_userprofile(self):
+        url = reverse('relationship_app:admin_view')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user_role, 'Admin')
+        self.assertFalse(any('relationship_app_userprofile' in q['sql'] for q in queries))
+
+    def test_role_change_invalidates_cache(self):
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 200)
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'Member'
+        profile.save()
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 302)
+        self.assertEqual(self.client.get(reverse('relationship_app:member_view')).status_code, 200)
+
+    def test_role_change_invalidates_cache_again_on_commit(self):
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.role = 'Member'
+            profile.save()
+            # A concurrent request caches the role before the commit
+            cache.set(f'relationship_app:user_role:{self.user.pk}', 'Admin')
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 302)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_not_used(self):
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 200)
+        UserProfile.objects.filter(user=self.user).update(role='Member')
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 302)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class CachedPermissionBackendTests(TestCase):
+    """
+    Resolved permission sets are shared through the cache and dropped
+    when grants or group membership change.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="bob", password="secret-pass-123")
+        self.group = Group.objects.create(name="Cataloguers")
+        self.group.permissions.add(Permission.objects.get(codename='can_add_book'))
+        self.client.force_login(self.user)
+        self.url = reverse('relationship_app:add_book')
+
+    def test_permission_checks_are_cached_across_requests(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertFalse(any('auth_permission' in q['sql'] for q in queries))
+
+    def test_group_membership_change_invalidates(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.user.groups.add(self.group)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.group.permissions.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_user_permission_and_group_delete_invalidate(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.group.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='can_add_book'))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_reused_user_id_does_not_inherit_cached_permissions(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        pk = self.user.pk
+        self.user.delete()
+        user = User.objects.create_user(pk=pk, username="carol", password="secret-pass-123")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_not_used(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertTrue(any('auth_permission' in q['sql'] for q in queries))
+
+
+class UserProfileSignalTests(TestCase):
+    """
+    UserProfile is written only when it actually changes.
+    """
+
+    def profile_writes(self, queries):
+        return [q['sql'] for q in queries
+                if 'relationship_app_userprofile' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_creating_a_user_inserts_one_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = User.objects.create_user(username="bob", password="secret-pass-123")
+        self.assertEqual(len(self.profile_writes(queries)), 1)
+        self.assertEqual(UserProfile.objects.get(user=user).role, 'Member')
+
+    def test_login_and_plain_saves_do_not_write_profile(self):
+        user = User.objects.create_user(username="bob", password="secret-pass-123")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.login(username="bob", password="secret-pass-123")
+            user.first_name = "Bob"
+            user.save()
+            user.userprofile  # loaded but unchanged
+            user.save()
+        self.assertEqual(self.profile_writes(queries), [])
+
+    def test_changed_profile_is_saved_with_user(self):
+        user = User.objects.create_user(username="bob", password="secret-pass-123")
+        user.userprofile.role = 'Librarian'
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).role, 'Librarian')
+
+    def test_saving_a_user_without_profile_creates_one(self):
+        user = User.objects.create_user(username="bob", password="secret-pass-123")
+        UserProfile.objects.filter(user=user).delete()
+        user = User.objects.get(pk=user.pk)
+        user.save()
+        self.assertEqual(UserProfile.objects.get(user=user).role, 'Member')
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(self.profile_writes(queries), [])
+
+    def test_provision_users_in_bulk(self):
+        accounts = [{'username': f"user{i}", 'role': 'Librarian'} for i in range(50)]
+        with CaptureQueriesContext(connection) as queries:
+            users = provision_users(accounts)
+        self.assertEqual(len(users), 50)
+        self.assertLessEqual(len(queries), 4)
+        self.assertEqual(UserProfile.objects.filter(role='Librarian').count(), 50)
+
+
+class ImportCatalogCommandTests(TestCase):
+    """
+    Tests for the import_catalog management command.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+
+    def run_import(self, **options):
+        options.setdefault('checkpoint', os.path.join(self.tmpdir.name, 'checkpoint.json'))
+        call_command('import_catalog', stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_imports_csv_and_ndjson(self):
+        books = self.write('books.csv', "title,author\n1984,George Orwell\nAnimal Farm,George Orwell\nEmma,Jane Austen\n")
+        holdings = self.write('holdings.ndjson', "\n".join(json.dumps(row) for row in [
+            {'library': "Central Library", 'title': "1984", 'author': "George Orwell"},
+            {'library': "Central Library", 'title': "Emma", 'author': "Jane Austen"},
+            {'library': "Central Library", 'title': "Missing", 'author': "Nobody"},
+        ]))
+        self.run_import(books=books, holdings=holdings, batch_size=2)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Book.objects.count(), 3)
+        library = Library.objects.get(name="Central Library")
+        self.assertEqual(set(library.books.values_list('title', flat=True)), {"1984", "Emma"})
+
+    def test_resume_skips_imported_rows_and_is_idempotent(self):
+        books = self.write('books.csv', "title,author\n1984,George Orwell\nEmma,Jane Austen\n")
+        checkpoint = self.write('checkpoint.json', json.dumps({'books': 1}))
+        self.run_import(books=books, resume=True, checkpoint=checkpoint)
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ["Emma"])
+        self.assertFalse(os.path.exists(checkpoint))
+
+        self.run_import(books=books)
+        self.assertEqual(Book.objects.count(), 2)
+
+
+class ExportBooksTests(TestCase):
+    """
+    Tests for the streaming catalog export.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        orwell = Author.objects.create(name="George Orwell")
+        lee = Author.objects.create(name="Harper Lee")
+        cls.nineteen = Book.objects.create(title="1984", author=orwell)
+        cls.farm = Book.objects.create(title="Animal Farm", author=orwell)
+        cls.mockingbird = Book.objects.create(title="To Kill a Mockingbird", author=lee)
+        cls.central = Library.objects.create(name="Central Library")
+        cls.university = Library.objects.create(name="University Library")
+        cls.central.books.add(cls.nineteen, cls.mockingbird)
+        cls.university.books.add(cls.nineteen)
+
+    def export(self, **params):
+        response = self.client.get(reverse('relationship_app:export_books'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        with self.settings(CATALOG_EXPORT_CHUNK_SIZE=2):
+            lines = self.export().splitlines()
+        self.assertEqual(lines[0], "id,title,author,library_ids")
+        self.assertEqual(lines[1], f"{self.nineteen.id},1984,George Orwell,{self.central.id};{self.university.id}")
+        self.assertEqual(len(lines), 4)
+
+    def test_ndjson_export_with_filters(self):
+        rows = [json.loads(line) for line in self.export(format='ndjson', library=self.central.id).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ["1984", "To Kill a Mockingbird"])
+        rows = [json.loads(line) for line in self.export(format='ndjson', author=self.farm.author_id).splitlines()]
+        self.assertEqual(rows[1], {'id': self.farm.id, 'title': "Animal Farm", 'author': "George Orwell", 'library_ids': []})
+
+    def test_bad_parameters(self):
+        url = reverse('relationship_app:export_books')
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'author': 'x'}).status_code, 400)
+
+
+class SearchBooksTests(TestCase):
+    """
+    Tests for the full-text book search.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rowling = Author.objects.create(name="J.K. Rowling")
+        cls.orwell = Author.objects.create(name="George Orwell")
+        cls.stone = Book.objects.create(title="Harry Potter and the Philosopher's Stone", author=cls.rowling)
+        cls.chamber = Book.objects.create(title="Harry Potter and the Chamber of Secrets", author=cls.rowling)
+        cls.farm = Book.objects.create(title="Animal Farm", author=cls.orwell)
+
+    def search(self, **params):
+        return self.client.get(reverse('relationship_app:search_books'), params).json()
+
+    def titles(self, **params):
+        return [row['title'] for row in self.search(**params)['results']]
+
+    def test_prefix_matching_on_title_and_author(self):
+        self.assertEqual(len(self.titles(q="harr pot")), 2)
+        self.assertEqual(self.titles(q="orw"), ["Animal Farm"])
+        self.assertEqual(self.titles(q="chamber"), ["Harry Potter and the Chamber of Secrets"])
+        self.assertEqual(self.titles(q='"; DROP'), [])
+
+    def test_pagination(self):
+        first = self.search(q="harry", page_size=1)
+        self.assertEqual(len(first['results']), 1)
+        self.assertEqual(first['next_page'], 2)
+        second = self.search(q="harry", page_size=1, page=2)
+        self.assertIsNone(second['next_page'])
+        self.assertNotEqual(first['results'], second['results'])
+
+    def test_index_follows_book_and_author_changes(self):
+        self.farm.title = "Nineteen Eighty-Four"
+        self.farm.save()
+        self.assertEqual(self.titles(q="animal"), [])
+        self.assertEqual(self.titles(q="eighty"), ["Nineteen Eighty-Four"])
+
+        self.orwell.name = "Eric Blair"
+        self.orwell.save()
+        self.assertEqual(self.titles(q="blair"), ["Nineteen Eighty-Four"])
+
+        self.chamber.delete()
+        self.assertEqual(self.titles(q="chamber"), [])
+
+    def test_rebuild_command(self):
+        Book.objects.filter(pk=self.farm.pk).update(title="Burmese Days")
+        self.assertEqual(self.titles(q="burmese"), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        # The update also skipped the catalog entry receivers
+        call_command('rebuild_catalog', stdout=StringIO())
+        self.assertEqual(self.titles(q="burmese"), ["Burmese Days"])
+
+
+class AuthorAutocompleteTests(TestCase):
+    """
+    The book form picks authors through the prefix search endpoint
+    instead of listing every author.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.orwell = Author.objects.create(name="George Orwell")
+        cls.eliot = Author.objects.create(name="George Eliot")
+        cls.gibson = Author.objects.create(name="William Gibson")
+        Author.objects.bulk_create(Author(name=f"Author {i:03d}") for i in range(50))
+        cls.book = Book.objects.create(title="Animal Farm", author=cls.orwell)
+        cls.user = User.objects.create_user(username="cataloguer", password="secret-pass-123")
+        cls.user.user_permissions.add(*Permission.objects.filter(codename__in=['can_add_book', 'can_change_book']))
+
+    def names(self, **params):
+        response = self.client.get(reverse('relationship_app:author_autocomplete'), params)
+        return [author['name'] for author in response.json()['results']]
+
+    def test_prefix_matches_ignore_case_in_name_order(self):
+        self.assertEqual(self.names(q="geo"), ["George Eliot", "George Orwell"])
+        self.assertEqual(self.names(q="GEORGE O"), ["George Orwell"])
+        self.assertEqual(self.names(q="orwell"), [])
+        self.assertEqual(self.names(q="  "), [])
+
+    def test_non_ascii_names_are_matched_like_the_database_lowers_them(self):
+        Author.objects.create(name="Émile Zola")
+        self.assertEqual(self.names(q="Ém"), ["Émile Zola"])
+        self.assertEqual(self.names(q="ÉMILE z"), ["Émile Zola"])
+
+    def test_prefix_at_the_end_of_unicode_does_not_fail(self):
+        for prefix in ("\U0010ffff", "geo\U0010ffff", "\ud7ff"):
+            response = self.client.get(reverse('relationship_app:author_autocomplete'), {'q': prefix})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.names(q="author")), settings.CATALOG_PAGE_SIZE)
+        self.assertEqual(self.names(q="author", limit=2), ["Author 000", "Author 001"])
+
+    def test_form_pages_do_not_list_authors(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('relationship_app:add_book'))
+        self.assertNotContains(response, "<option")
+        self.assertContains(response, reverse('relationship_app:author_autocomplete'))
+        self.assertContains(response, "author_autocomplete.js")
+        self.assertContains(response, "author_autocomplete.css")
+        response = self.client.get(reverse('relationship_app:edit_book', args=[self.book.pk]))
+        self.assertContains(response, f'name="author" value="{self.orwell.pk}"')
+        self.assertContains(response, 'value="George Orwell"')
+
+    def test_submitted_author_is_validated_by_primary_key(self):
+        form = BookForm({'title': "Middlemarch", 'author': self.eliot.pk})
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['author'], self.eliot)
+        self.assertFalse(BookForm({'title': "Middlemarch", 'author': 0}).is_valid())
+        self.assertFalse(BookForm({'title': "Middlemarch", 'author': ''}).is_valid())
+
+
+class CatalogIndexTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN checks that the common catalog lookups use indexes.
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_book_lookups_use_indexes(self):
+        self.assertUsesIndex(Book.objects.order_by('title', 'id')[:20], 'relapp_book_title_id_idx')
+        self.assertUsesIndex(Book.objects.filter(author_id=1).order_by('title'), 'relapp_book_author_title_idx')
+
+    def test_keyset_page_seeks_into_title_index(self):
+        page = Book.objects.filter(_keyset_filter(('title', 'id'), ["M", 10], 'gt')).order_by('title', 'id')[:20]
+        self.assertUsesIndex(page, 'relapp_book_title_id_idx')
+        self.assertIn('title>?', page.explain().replace(' ', ''))
+
+    def test_catalog_entry_pages_use_indexes(self):
+        page = CatalogEntry.objects.filter(_keyset_filter(('title', 'id'), ["M", 10], 'gt')).order_by('title', 'id')[:20]
+        self.assertUsesIndex(page, 'relapp_entry_title_id_idx')
+        self.assertUsesIndex(CatalogEntry.objects.filter(author_id=1), 'relapp_entry_author_idx')
+
+    def test_library_filter_seeks_into_holdings(self):
+        # The unique constraint's index is named sqlite_autoindex_*
+        books = filter_catalog(catalog_books(), library_id=1).order_by('id')
+        self.assertUsesIndex(books, 'catalogholding_1 (library_id=?)')
+        self.assertNotIn('SCAN', books.explain())
+
+    def test_name_lookups_use_indexes(self):
+        self.assertUsesIndex(Author.objects.filter(name="George Orwell"), 'relapp_author_name_idx')
+        self.assertUsesIndex(Library.objects.filter(name="Central Library"), 'relapp_library_name_idx')
+
+    def test_author_prefix_search_uses_case_insensitive_index(self):
+        prefix = Author.objects.annotate(lower_name=Lower('name')).filter(lower_name__gte="geo", lower_name__lt="gep")
+        self.assertUsesIndex(prefix.order_by('lower_name')[:10], 'relapp_author_name_ci_unique')
+
+    def test_author_names_are_unique_ignoring_case(self):
+        Author.objects.create(name="George Orwell")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Author.objects.create(name="george orwell")
+
+
+class BenchmarkHelperTests(TestCase):
+    """
+    Tests for the synthetic catalog generator and baseline comparison.
+    """
+
+    def test_generate_catalog(self):
+        summary = generate_catalog(books=200, libraries=3, density=0.25)
+        self.assertEqual(Book.objects.count(), 200)
+        self.assertEqual(Librarian.objects.count(), 3)
+        for library in Library.objects.all():
+            self.assertEqual(library.books.count(), summary['holdings_per_library'])
+        self.assertEqual(summary['holdings_per_library'], 50)
+
+    def test_compare_results_flags_regressions(self):
+        baseline = {'views': {'list_books': {'p95_ms': 10.0, 'queries': 3}}}
+        slower = {'views': {'list_books': {'p95_ms': 13.0, 'queries': 4}}}
+        self.assertEqual(len(compare_results(slower, baseline, tolerance=0.2)), 2)
+        self.assertEqual(compare_results(slower, baseline, tolerance=0.5)[0], "list_books: queries 3 -> 4")
+
+    def test_load_stats_summary_and_timeline(self):
+        stats = LoadStats()
+        stats.samples = [
+            (0.5, 'list_books', 0.010, True),
+            (1.5, 'list_books', 0.030, True),
+            (2.5, 'edit_book', 0.050, True),
+            (3.0, 'edit_book', 0.200, False),
+        ]
+        summary = stats.summary(elapsed=4.0)
+        self.assertEqual(summary['all']['requests'], 4)
+        self.assertEqual(summary['all']['requests_per_sec'], 1.0)
+        self.assertEqual(summary['edit_book']['error_rate'], 0.5)
+        # Failed requests count as errors, not latency samples
+        self.assertEqual(summary['edit_book']['p99_ms'], 50.0)
+        # Nearest-rank, like the benchmark command
+        self.assertEqual(summary['list_books']['p50_ms'], 10.0)
+        timeline = stats.timeline(interval=2)
+        self.assertEqual([row['t'] for row in timeline], [0, 2])
+        self.assertEqual([row['requests'] for row in timeline], [2, 2])
+
+    def test_loadtest_rejects_edit_only_mix_without_librarians(self):
+        with self.assertRaisesMessage(CommandError, "The edit flow needs librarian accounts"):
+            call_command('loadtest', '--librarians', '0', '--mix', 'edit=10,register=0', stdout=StringIO())
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsTests(TestCase):
+    """
+    Tests for the per-view metrics middleware and /metrics endpoint.
+    """
+
+    def metric_value(self, text, line_prefix):
+        for line in text.splitlines():
+            if line.startswith(line_prefix):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def scrape(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_view(self):
+        Author.objects.create(name="Harper Lee")
+        view = 'view="relationship_app:list_books"'
+        before = self.scrape()
+        self.client.get(reverse('relationship_app:list_books'))
+        after = self.scrape()
+
+        requests = f'django_http_requests_total{{{view},status="200"}}'
+        self.assertEqual(self.metric_value(after, requests) - self.metric_value(before, requests), 1)
+        self.assertGreater(
+            self.metric_value(after, f'django_sql_queries_total{{{view}}}'),
+            self.metric_value(before, f'django_sql_queries_total{{{view}}}'),
+        )
+        self.assertIn(f'django_http_request_duration_seconds_bucket{{{view},le="+Inf"}}', after)
+        self.assertIn(f'django_http_response_size_bytes_count{{{view}}}', after)
+
+    @override_settings(ROOT_URLCONF='LibraryProject.urls_asgi')
+    async def test_async_view_queries_are_recorded(self):
+        await Author.objects.acreate(name="Harper Lee")
+        before = collect()['relationship_app:list_books'].queries
+        await self.async_client.get(reverse('relationship_app:list_books'))
+        self.assertGreater(collect()['relationship_app:list_books'].queries, before)
+
+    def test_recorder_is_installed_on_every_connection(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            replica = connections['default'].__class__(
+                {**connection.settings_dict, 'NAME': os.path.join(tmpdir, 'replica.sqlite3')}, alias='replica_test',
+            )
+            try:
+                with replica.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                self.assertIn(record_queries, replica.execute_wrappers)
+            finally:
+                replica.close()
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code, 404)
+
+    def test_shards_from_other_threads_are_aggregated(self):
+        thread = threading.Thread(target=record_request, args=('test:threaded', 200, 0.02, 3, 0.001, 100))
+        thread.start()
+        thread.join()
+        record_request('test:threaded', 200, 0.02, 2, 0.001, 100)
+        stats = collect()['test:threaded']
+        self.assertEqual(stats.requests[200], 2)
+        self.assertEqual(stats.queries, 5)
+
+    def test_shards_of_exited_threads_are_retired(self):
+        for _ in range(5):
+            thread = threading.Thread(target=record_request, args=('test:retired', 200, 0.02, 1, 0.001, 100))
+            thread.start()
+            thread.join()
+        stats = collect()['test:retired']
+        self.assertEqual(stats.requests[200], 5)
+        self.assertEqual(stats.queries, 5)
+        self.assertTrue(all(thread.is_alive() for thread in metrics._shards))
+
+
+class SQLiteBackendTests(TestCase):
+    """
+    Tests for the tuned SQLite backend pragmas.
+    """
+
+    def pragma(self, cursor, name):
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(self.pragma(cursor, 'synchronous'), 1)  # NORMAL
+            timeout = connection.settings_dict['OPTIONS']['timeout']
+            self.assertEqual(self.pragma(cursor, 'busy_timeout'), timeout * 1000)
+            self.assertEqual(self.pragma(cursor, 'temp_store'), 2)  # MEMORY
+
+    def test_opening_a_file_database_leaves_its_journal_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'wal.sqlite3')
+            wrapper = connections['default'].__class__({**connection.settings_dict, 'NAME': path})
+            try:
+                with wrapper.cursor() as cursor:
+                    self.assertEqual(self.pragma(cursor, 'journal_mode'), 'delete')
+                self.assertFalse(os.path.exists(f'{path}-wal'))
+                wrapper.enable_wal()
+                with wrapper.cursor() as cursor:
+                    self.assertEqual(self.pragma(cursor, 'journal_mode'), 'wal')
+            finally:
+                wrapper.close()
+
+
+class ReplicaRouterTests(TestCase):
+    """
+    Tests for read/write splitting and primary pinning after writes.
+    """
+
+    def route(self, *calls):
+        # Run in a fresh context so writes made by other tests don't pin it
+        router = ReplicaRouter()
+        return contextvars.Context().run(lambda: [call(router) for call in calls])
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        routes = self.route(
+            lambda router: router.db_for_read(Book),
+            lambda router: router.db_for_read(User),
+            lambda router: router.db_for_write(Book),
+            lambda router: router.db_for_read(Book),
+        )
+        self.assertEqual(routes, ['replica1', None, 'default', 'default'])
+
+    def test_everything_goes_to_the_primary_without_replicas(self):
+        self.assertEqual(self.route(lambda router: router.db_for_read(Book)), ['default'])
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertIs(router.allow_migrate('replica1', 'relationship_app'), False)
+        self.assertIsNone(router.allow_migrate('default', 'relationship_app'))
+
+    @override_settings(REPLICA_DATABASES=['default'])
+    def test_write_pins_the_client_with_a_cookie(self):
+        author = Author.objects.create(name="Ursula K. Le Guin")
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get(reverse('relationship_app:list_books'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('relationship_app:add_book'), {'title': "The Dispossessed", 'author': author.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_catalog_pages_read_from_the_primary(self):
+        # Any read routed to the replica would fail: the alias doesn't exist
+        library = Library.objects.create(name="Central Library")
+        self.assertEqual(self.client.get(reverse('relationship_app:list_books')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('relationship_app:library_detail', args=[library.pk])).status_code, 200)
+        with override_settings(ROOT_URLCONF='LibraryProject.urls_asgi'):
+            response = async_to_sync(self.async_client.get)(reverse('relationship_app:list_books'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REPLICA_DATABASES=['missing_replica'], CACHES=SHARED_CACHES)
+    def test_writes_and_cached_reads_use_the_primary(self):
+        author = Author.objects.create(name="Ursula K. Le Guin")
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        user.userprofile.role = 'Admin'
+        user.userprofile.save()
+        self.client.force_login(user)
+        # The form's author lookup runs before the write
+        response = self.client.post(reverse('relationship_app:add_book'), {'title': "The Dispossessed", 'author': author.pk})
+        self.assertEqual(response.status_code, 302)
+        self.client.cookies.pop(PIN_COOKIE)
+        # The role read fills the role cache
+        self.assertEqual(self.client.get(reverse('relationship_app:admin_view')).status_code, 200)
+
+    def test_copy_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source, target = os.path.join(tmpdir, 'primary.sqlite3'), os.path.join(tmpdir, 'replica.sqlite3')
+            with sqlite3.connect(source) as conn:
+                conn.execute("CREATE TABLE book (title TEXT)")
+                conn.execute("INSERT INTO book VALUES ('Kindred')")
+            conn.close()
+            copy_database(source, target)
+            conn = sqlite3.connect(target)
+            self.assertEqual(conn.execute("SELECT title FROM book").fetchall(), [('Kindred',)])
+            conn.close()
+
+
+@override_settings(ROOT_URLCONF='LibraryProject.urls_asgi')
+class AsyncViewTests(TestCase):
+    """
+    Tests for the async catalog views served under ASGI.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="Octavia E. Butler")
+        books = Book.objects.bulk_create([Book(title=f"Parable {i:02d}", author=author) for i in range(15)])
+        cls.library = Library.objects.create(name="Pasadena Public Library")
+        Librarian.objects.create(name="Pasadena Librarian", library=cls.library)
+        cls.library.books.add(*books[:5])
+        cls.ordered_ids = [book.id for book in books]
+        rebuild_catalog_entries()
+        rebuild_search_index()
+
+    async def test_list_books_pages(self):
+        url = reverse('relationship_app:list_books')
+        first = (await self.async_client.get(url, {'format': 'json', 'page_size': 10})).json()
+        second = (await self.async_client.get(url, {'format': 'json', 'page_size': 10, 'cursor': first['next']})).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], self.ordered_ids)
+        self.assertIsNone(second['next'])
+        self.assertEqual((await self.async_client.get(url, {'cursor': 'bogus'})).status_code, 404)
+
+    async def test_list_books_html_for_a_user_with_permissions(self):
+        user = await User.objects.acreate_superuser('admin', 'admin@example.com', 'pw')
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse('relationship_app:list_books'))
+        self.assertContains(response, reverse('relationship_app:edit_book', args=[self.ordered_ids[0]]))
+        self.assertTrue(response.context['can_delete_book'])
+
+    async def test_library_detail(self):
+        response = await self.async_client.get(reverse('relationship_app:library_detail', args=[self.library.pk]))
+        self.assertEqual(response.context['books_count'], 5)
+        self.assertContains(response, "Pasadena Librarian")
+        missing = await self.async_client.get(reverse('relationship_app:library_detail', args=[0]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_conditional_get(self):
+        url = reverse('relationship_app:library_detail', args=[self.library.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_search(self):
+        response = await self.async_client.get(reverse('relationship_app:search_books'), {'q': 'parable', 'page_size': 5})
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(response.json()['next_page'], 2)
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Tests for the ETag validators on catalog pages.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Toni Morrison")
+        cls.book = Book.objects.create(title="Beloved", author=cls.author)
+        cls.library = Library.objects.create(name="Lorain Public Library")
+        cls.library.books.add(cls.book)
+
+    def test_unchanged_list_is_not_modified_without_catalog_queries(self):
+        url = reverse('relationship_app:list_books')
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        # Only the catalog version row is read
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # A different page of the catalog has its own ETag
+        other = self.client.get(url, {'page_size': 5}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+        Book.objects.create(title="Sula", author=self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_if_modified_since_alone_is_not_enough(self):
+        # Pages differ per user, so only the session-aware ETag validates them
+        url = reverse('relationship_app:library_detail', args=[self.library.pk])
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        later = 'Sun, 01 Jan 2090 00:00:00 GMT'
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=later).status_code, 200)
+
+    def test_holdings_change_the_etag(self):
+        url = reverse('relationship_app:library_detail', args=[self.library.pk])
+        etag = self.client.get(url)['ETag']
+        self.library.books.remove(self.book)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_updated_at_is_maintained(self):
+        before = self.book.updated_at
+        self.book.title = "Song of Solomon"
+        self.book.save()
+        self.assertGreater(self.book.updated_at, before)
+
+
+class BookCountTests(TestCase):
+    """
+    Tests for the denormalized Library.book_count and Author.book_count.
+    """
+
+    def setUp(self):
+        self.le_guin = Author.objects.create(name="Ursula K. Le Guin")
+        self.butler = Author.objects.create(name="Octavia E. Butler")
+        self.books = [Book.objects.create(title=f"Earthsea {i}", author=self.le_guin) for i in range(3)]
+        self.library = Library.objects.create(name="Portland Library")
+        self.other = Library.objects.create(name="Berkeley Library")
+
+    def counts(self):
+        return (
+            Library.objects.get(pk=self.library.pk).book_count,
+            Library.objects.get(pk=self.other.pk).book_count,
+            Author.objects.get(pk=self.le_guin.pk).book_count,
+            Author.objects.get(pk=self.butler.pk).book_count,
+        )
+
+    def test_holdings_from_both_sides(self):
+        self.library.books.add(*self.books)
+        self.library.books.add(self.books[0])  # already held: no change
+        self.books[0].libraries.add(self.other)
+        self.assertEqual(self.counts(), (3, 1, 3, 0))
+
+        self.library.books.remove(self.books[1], Book.objects.create(title="Kindred", author=self.butler))
+        self.assertEqual(self.counts(), (2, 1, 3, 1))
+        self.books[0].libraries.clear()
+        self.assertEqual(self.counts(), (1, 0, 3, 1))
+        self.library.books.clear()
+        self.assertEqual(self.counts(), (0, 0, 3, 1))
+
+    def test_book_author_change_and_delete(self):
+        self.library.books.add(*self.books)
+        book = Book.objects.get(pk=self.books[0].pk)
+        book.author = self.butler
+        book.save()
+        self.assertEqual(self.counts(), (3, 0, 2, 1))
+
+        book.delete()
+        self.assertEqual(self.counts(), (2, 0, 2, 0))
+        self.le_guin.delete()
+        self.assertEqual(Library.objects.get(pk=self.library.pk).book_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        self.library.books.add(*self.books)
+        Library.objects.filter(pk=self.library.pk).update(book_count=7)
+        Author.objects.filter(pk=self.butler.pk).update(book_count=2)
+        out = StringIO()
+        call_command('reconcile_book_counts', '--dry-run', stdout=out)
+        self.assertIn("library: 1 rows drifted", out.getvalue())
+        self.assertEqual(self.counts(), (7, 0, 3, 2))
+
+        call_command('reconcile_book_counts', stdout=StringIO())
+        self.assertEqual(self.counts(), (3, 0, 3, 0))
+
+
+class CatalogAPITests(TestCase):
+    """
+    Tests for the read-only JSON API.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.austen = Author.objects.create(name="Jane Austen")
+        cls.bronte = Author.objects.create(name="Charlotte Bronte")
+        cls.books = [Book.objects.create(title=f"Novel {i:02d}", author=cls.austen if i % 2 else cls.bronte) for i in range(12)]
+        cls.library = Library.objects.create(name="Bath Library")
+        cls.library.books.add(*cls.books[:4])
+        Librarian.objects.create(name="Anne Elliot", library=cls.library)
+
+    def get(self, resource, pk=None, **params):
+        if pk is None:
+            url = reverse('relationship_app:api_list', args=[resource])
+        else:
+            url = reverse('relationship_app:api_detail', args=[resource, pk])
+        return self.client.get(url, params)
+
+    def test_sparse_fields_and_cursor_pagination(self):
+        first = self.get('books', fields='title', page_size=5).json()
+        self.assertEqual(first['results'][0], {'title': "Novel 00"})
+        seen = [row['title'] for row in first['results']]
+        cursor = first['next']
+        while cursor:
+            page = self.get('books', fields='title', page_size=5, cursor=cursor).json()
+            seen += [row['title'] for row in page['results']]
+            cursor = page['next']
+        self.assertEqual(seen, [f"Novel {i:02d}" for i in range(12)])
+
+    def test_embeds_cost_a_fixed_number_of_queries(self):
+        # Catalog version (ETag), page, authors, holdings and libraries,
+        # whatever the page size
+        with self.assertNumQueries(5):
+            results = self.get(
+                'books', embed='author,libraries', fields='id', **{'fields[author]': 'name'}, page_size=10,
+            ).json()['results']
+        self.assertEqual(results[0]['author'], {'name': "Charlotte Bronte"})
+        self.assertEqual(results[0]['libraries'][0]['name'], "Bath Library")
+        self.assertEqual(results[5]['libraries'], [])
+
+    def test_filters_and_detail(self):
+        held = self.get('books', library=self.library.pk, fields='id').json()['results']
+        self.assertEqual(len(held), 4)
+        library = self.get('libraries', self.library.pk, embed='librarian').json()
+        self.assertEqual(library['book_count'], 4)
+        self.assertEqual(library['librarian']['name'], "Anne Elliot")
+        self.assertEqual(self.get('authors', 0).status_code, 404)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get('books', fields='title,isbn').status_code, 400)
+        self.assertEqual(self.get('books', embed='publisher').status_code, 400)
+        self.assertEqual(self.get('books', cursor='bogus').status_code, 400)
+        self.assertEqual(self.get('books', cursor=encode_cursor(['a', 'x'])).status_code, 400)
+        self.assertEqual(self.get('authors', cursor=encode_cursor([None, None], 'prev')).status_code, 400)
+        self.assertEqual(self.get('books', author='x').status_code, 400)
+        self.assertEqual(self.get('publishers').status_code, 404)
+
+
+class StaticAssetsTests(TestCase):
+    """
+    Stylesheets are collected under content-hashed names with gzipped
+    variants, served as immutable, and HTML responses are compressed.
+    """
+
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        # Also resets staticfiles_storage
+        self.enterContext(override_settings(STATIC_ROOT=self.static_root.name))
+
+    def test_hashed_stylesheet_is_served_precompressed_and_immutable(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        url = static('relationship_app/css/login.css')
+        self.assertRegex(url, r'/login\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'font-family', gzip.decompress(b''.join(response.streaming_content)))
+
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        plain = self.client.get('/static/relationship_app/css/login.css')
+        self.assertNotIn('immutable', plain['Cache-Control'])
+
+    def test_only_manifest_names_count_as_hashed(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        url = static('relationship_app/css/base.css')
+        name = url.removeprefix(settings.STATIC_URL)
+        self.assertTrue(staticfiles_storage.is_hashed_name(name))
+        self.assertFalse(staticfiles_storage.is_hashed_name('relationship_app/css/base.css'))
+        self.assertFalse(staticfiles_storage.is_hashed_name('relationship_app/css/base.0123456789ab.css'))
+
+    def test_uncollected_files_keep_their_plain_names(self):
+        self.assertEqual(static('relationship_app/css/login.css'), '/static/relationship_app/css/login.css')
+
+    def test_html_is_gzipped(self):
+        response = self.client.get(reverse('relationship_app:login'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'relationship_app/css/login.css', gzip.decompress(response.content))
+
+
+class LibraryHoldingsSyncTests(TestCase):
+    """
+    Tests for the set-based holdings sync service and endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name="Ursula K. Le Guin")
+        cls.books = Book.objects.bulk_create([Book(title=f"Earthsea {i:02d}", author=author) for i in range(10)])
+        cls.library = Library.objects.create(name="Portland Library")
+        cls.library.books.add(*cls.books[:4])
+
+    def held_ids(self):
+        return sorted(self.library.books.values_list('id', flat=True))
+
+    def test_full_sync_applies_the_difference(self):
+        ids = [book.id for book in self.books]
+        version = get_catalog_version()
+        # Staging, diff, one DELETE, one INSERT, the counter and the catalog
+        # version, then five queries per 500 changed books to refresh their
+        # catalog entries and holdings
+        with self.assertNumQueries(18):
+            added, removed = sync_library_holdings(self.library, book_ids=ids[2:7])
+        self.assertEqual((added, removed), (ids[4:7], ids[:2]))
+        self.assertEqual(self.held_ids(), ids[2:7])
+        self.library.refresh_from_db()
+        self.assertEqual(self.library.book_count, 5)
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_delta_sync(self):
+        ids = [book.id for book in self.books]
+        added, removed = sync_library_holdings(self.library, add=[ids[3], ids[8]], remove=[ids[0], ids[9]])
+        self.assertEqual((added, removed), ([ids[8]], [ids[0]]))
+        self.assertEqual(self.held_ids(), ids[1:4] + [ids[8]])
+        self.assertEqual(reconcile_book_counts(dry_run=True)['library'], 0)
+
+    def test_unknown_books_change_nothing(self):
+        with self.assertRaises(UnknownBooks) as raised:
+            sync_library_holdings(self.library, book_ids=[self.books[0].id, 0])
+        self.assertEqual(raised.exception.book_ids, [0])
+        self.assertEqual(len(self.held_ids()), 4)
+
+    def test_endpoint(self):
+        url = reverse('relationship_app:library_holdings', args=[self.library.pk])
+        payload = json.dumps({'add': [self.books[9].id]})
+        self.assertEqual(self.client.patch(url, payload, content_type='application/json').status_code, 403)
+
+        user = User.objects.create_user(username="curator", password="secret-pass-123")
+        user.user_permissions.add(Permission.objects.get(codename='change_library'))
+        self.client.force_login(user)
+        response = self.client.patch(url, payload, content_type='application/json')
+        self.assertEqual(response.json(), {'library': self.library.pk, 'added': 1, 'removed': 0, 'book_count': 5})
+        response = self.client.put(url, json.dumps({'books': []}), content_type='application/json')
+        self.assertEqual(response.json()['book_count'], 0)
+        response = self.client.put(url, json.dumps({'books': ['x']}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogEntryTests(TestCase):
+    """
+    The CatalogEntry read model follows book, author and holdings changes
+    and serves the catalog views from a single table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Ann Leckie")
+        cls.books = [Book.objects.create(title=f"Ancillary {i}", author=cls.author) for i in range(4)]
+        cls.library = Library.objects.create(name="Radch Library")
+        cls.other = Library.objects.create(name="Athoek Library")
+
+    def assertConsistent(self):
+        self.assertEqual(check_catalog_entries(), {'missing': [], 'stale': [], 'orphaned': []})
+
+    def test_entries_follow_changes(self):
+        self.library.books.add(*self.books[:3])
+        self.books[0].libraries.add(self.other)
+        self.assertEqual(CatalogEntry.objects.get(pk=self.books[0].pk).library_ids, f',{self.library.pk},{self.other.pk},')
+        self.assertEqual(CatalogHolding.objects.filter(library_id=self.library.pk).count(), 3)
+        self.assertConsistent()
+
+        self.author.name = "A. Leckie"
+        self.author.save()
+        self.books[1].title = "Ancillary Sword"
+        self.books[1].save()
+        self.library.books.remove(self.books[2])
+        self.assertConsistent()
+
+        self.library.books.clear()
+        self.other.delete()
+        self.books[3].delete()
+        self.assertConsistent()
+        self.assertEqual(set(CatalogEntry.objects.values_list('library_ids', flat=True)), {''})
+
+    def test_catalog_views_read_one_table(self):
+        self.library.books.add(self.books[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('relationship_app:list_books'), {'format': 'json'})
+            response = self.client.get(reverse('relationship_app:export_books'), {'library': self.library.pk})
+            rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[1:], [f'{self.books[0].pk},Ancillary 0,Ann Leckie,{self.library.pk}'])
+        catalog_queries = [q['sql'] for q in queries if 'relationship_app_' in q['sql']]
+        self.assertTrue(catalog_queries)
+        self.assertFalse(any('JOIN' in sql for sql in catalog_queries))
+
+    def test_check_and_rebuild_commands(self):
+        CatalogEntry.objects.filter(pk=self.books[0].pk).update(title="Drifted")
+        CatalogEntry.objects.filter(pk=self.books[1].pk).delete()
+        CatalogHolding.objects.create(library_id=self.library.pk, book_id=self.books[2].pk)
+        CatalogHolding.objects.create(library_id=self.library.pk, book_id=10**9)
+        with self.assertRaises(CommandError):
+            call_command('check_catalog', stdout=StringIO())
+        out = StringIO()
+        call_command('check_catalog', '--repair', stdout=out)
+        self.assertIn("missing: 1 entries", out.getvalue())
+        self.assertIn("orphaned: 1 entries", out.getvalue())
+        self.assertIn("Repaired 4 entries.", out.getvalue())
+        self.assertConsistent()
+        self.assertFalse(CatalogHolding.objects.exists())
+
+        self.library.books.add(self.books[0])
+        CatalogEntry.objects.all().delete()
+        CatalogHolding.objects.all().delete()
+        call_command('rebuild_catalog', stdout=StringIO())
+        self.assertConsistent()
+        self.assertEqual(list(CatalogHolding.objects.values_list('library_id', 'book_id')), [(self.library.pk, self.books[0].pk)])
+
+
+class BrokenPool:
+    """
+    A process pool whose worker processes have died.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def submit(self, function, *args):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly.")
+
+
+class InlinePool(BrokenPool):
+    """
+    A process pool that runs each job in the calling thread.
+    """
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+class JobQueueTests(TestCase):
+    """
+    Tests for the database-backed job queue and its endpoints.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="operator", password="secret-pass-123")
+        self.user.user_permissions.add(*Permission.objects.filter(codename__in=['add_job', 'view_job', 'change_job']))
+        self.client.force_login(self.user)
+
+    def register(self, name, function):
+        task(name)(function)
+        self.addCleanup(TASKS.pop, name)
+
+    def test_queue_run_and_poll(self):
+        Book.objects.create(title="Kindred", author=Author.objects.create(name="Octavia E. Butler"))
+        response = self.client.post(
+            reverse('relationship_app:job_list'),
+            json.dumps({'name': 'reconcile_book_counts', 'arguments': {'dry_run': True}}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+
+        call_command('run_workers', '--once', '--processes', '0', stdout=StringIO(), stderr=StringIO())
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['progress']), ('succeeded', 100))
+        self.assertEqual(job['result'], {'library': 0, 'author': 0})
+
+    def test_workers_warn_about_process_local_caches(self):
+        stderr = StringIO()
+        call_command('run_workers', '--once', '--processes', '0', stdout=StringIO(), stderr=stderr)
+        self.assertIn("Process-local cache (LocMemCache) configured for default", stderr.getvalue())
+        with override_settings(CACHES=SHARED_CACHES):
+            stderr = StringIO()
+            call_command('run_workers', '--once', '--processes', '0', stdout=StringIO(), stderr=stderr)
+        self.assertEqual(stderr.getvalue(), "")
+
+    def test_broken_pool_is_replaced_and_the_claim_released(self):
+        job = enqueue('reconcile_book_counts', {'dry_run': True})
+        pools = [BrokenPool(), InlinePool()]
+        command = run_workers.Command(stdout=StringIO(), stderr=StringIO())
+        command.worker = 'test-worker'
+        command.make_pool = lambda processes: pools.pop(0)
+        command.run_pool(1, 0.01, once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 1))
+        self.assertIn("starting a new pool", command.stderr.getvalue())
+
+    def test_crash_of_a_cancelled_job_marks_it_cancelled(self):
+        job = enqueue('reconcile_book_counts')
+        claim_next_job('test-worker')
+        Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+        record_failure(job.pk, "Worker process failed")
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.CANCELLED)
+
+    def test_invalid_jobs_and_permissions(self):
+        url = reverse('relationship_app:job_list')
+        for payload in ({'name': 'format_disk'}, {'name': 'rebuild_catalog', 'arguments': {'force': True}}):
+            self.assertEqual(self.client.post(url, json.dumps(payload), content_type='application/json').status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        def flaky(job):
+            raise RuntimeError("disk full")
+        self.register('flaky', flaky)
+        job = Job.objects.create(name='flaky', max_attempts=2)
+
+        run_job(claim_next_job('test:1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("disk full", job.error)
+        self.assertGreater(job.run_after, job.started_at)
+        # Not due until the backoff has passed
+        self.assertIsNone(claim_next_job('test:1'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.started_at)
+        self.assertEqual(run_job(claim_next_job('test:1')), Job.FAILED)
+
+    def test_cancellation(self):
+        def long_running(job):
+            Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+            report_progress(job, 50)
+        self.register('long_running', long_running)
+
+        queued = Job.objects.create(name='long_running')
+        response = self.client.post(reverse('relationship_app:job_cancel', args=[queued.pk]))
+        self.assertEqual(response.json()['status'], 'cancelled')
+        self.assertIsNone(claim_next_job('test:1'))
+
+        running = Job.objects.create(name='long_running')
+        self.assertEqual(claim_next_job('test:1'), running.pk)
+        self.assertIsNone(claim_next_job('test:2'))
+        self.assertEqual(run_job(running.pk), Job.CANCELLED)
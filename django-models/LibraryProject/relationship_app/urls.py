@@ -9,6 +9,27 @@ urlpatterns = [
     # Function-based view for listing all books
     path('books/', list_books, name='list_books'),
     
+    # Streaming CSV/NDJSON export of the catalog
+    path('books/export/', views.export_books, name='export_books'),
+    
+    # Full-text search over book titles and author names
+    path('books/search/', views.search_books, name='search_books'),
+    
+    # Author name prefix search for the book form's author picker
+    path('authors/autocomplete/', views.author_autocomplete, name='author_autocomplete'),
+    
+    # Read-only JSON API: books, authors, libraries and librarians
+    path('api/<str:resource>/', views.api_list, name='api_list'),
+    path('api/<str:resource>/<int:pk>/', views.api_detail, name='api_detail'),
+    
+    # Bulk holdings sync for a library (PUT full set, PATCH delta)
+    path('api/libraries/<int:pk>/holdings/', views.library_holdings, name='library_holdings'),
+    
+    # Background jobs: queue, status/progress and cancellation
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/cancel/', views.job_cancel, name='job_cancel'),
+    
     # Class-based view for library details
     path('library/<int:pk>/', views.LibraryDetailView.as_view(), name='library_detail'),
     
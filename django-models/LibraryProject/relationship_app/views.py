@@ -1,7 +1,17 @@
+import hashlib
+import json
+from functools import wraps
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views.generic.detail import DetailView
 from django.views.generic import ListView
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET, require_POST, require_http_methods
+from django.utils.decorators import method_decorator
+from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.views import LoginView, LogoutView
@@ -9,8 +19,20 @@ from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.decorators import permission_required
 from django.contrib import messages
 from django import forms
+from django.conf import settings
+from LibraryProject.routers import use_primary
 from .models import Book, Author, Librarian, UserProfile
-from .models import Library
+from .models import Job, Library
+from .pagination import InvalidCursor, get_page_size, paginate_keyset
+from .cache import get_book_card_versions, get_card_cache_alias, get_catalog_version
+from .roles import get_user_role
+from .export import iter_book_rows, iter_csv, iter_ndjson
+from .search import autocomplete_authors, search_books as run_search
+from .catalog import catalog_books, filter_catalog
+from .api import RESOURCES, APIError, get_resource, list_resource
+from .services import UnknownBooks, sync_library_holdings
+from .jobs import JobError, cancel_job, enqueue, serialize_job
+from .widgets import AuthorAutocompleteWidget
 
 # Create your views here.
 
@@ -21,17 +43,309 @@ class BookForm(forms.ModelForm):
         fields = ['title', 'author']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter book title'}),
-            'author': forms.Select(attrs={'class': 'form-control'}),
+            'author': AuthorAutocompleteWidget(attrs={'class': 'form-control', 'placeholder': 'Start typing an author name'}),
         }
+    
+    def _get_validation_exclusions(self):
+        # The author field already fetched the submitted author by primary
+        # key; skip the model's second existence query for the foreign key
+        exclusions = super()._get_validation_exclusions()
+        exclusions.add('author')
+        return exclusions
+
+# Conditional GET validator for catalog pages. It only reads the catalog
+# version row, so a 304 costs a single primary-key query. The ETag also
+# covers the URL and the session cookie, because the pages render
+# per-user permission checks and messages. There is no Last-Modified: one
+# catalog-wide date would let If-Modified-Since alone revalidate a page
+# rendered for another user. The version is read from the primary, so the
+# page is too: rows from a lagging replica would be sent under the new
+# ETag and then revalidated until the next catalog change.
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Weak ETag from the catalog version, the full path and the session.
+    """
+    key = '|'.join([
+        str(get_catalog_version()),
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+    ])
+    return f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
 
+def catalog_condition(view):
+    """
+    condition() with catalog_etag, reading the page from the primary.
+    """
+    conditional = condition(etag_func=catalog_etag)(view)
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        with use_primary():
+            return conditional(request, *args, **kwargs)
+    return inner
+
+@catalog_condition
 def list_books(request):
     """
-    Function-based view that lists all books stored in the database.
-    Renders a list of book titles and their authors.
+    Function-based view that lists the books stored in the database.
+    Renders one page of book titles and their authors, ordered by (title, id)
+    and paginated with an opaque cursor instead of OFFSET.
+    Pass ?format=json to get the same page as JSON.
+    """
+    page_size = get_page_size(request.GET.get('page_size'))
+    books = catalog_books()
+    try:
+        page = paginate_keyset(books, ('title', 'id'), request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+
+    if request.GET.get('format') == 'json':
+        return book_page_response(page, page_size)
+
+    context = book_list_context(
+        page, page_size,
+        can_change_book=request.user.has_perm('relationship_app.can_change_book'),
+        can_delete_book=request.user.has_perm('relationship_app.can_delete_book'),
+    )
+    return render(request, 'relationship_app/list_books.html', context)
+
+def book_page_response(page, page_size):
+    """
+    JSON response for one KeysetPage of books (list_books?format=json).
+    """
+    return JsonResponse({
+        'results': [
+            {'id': book.id, 'title': book.title, 'author': book.author_name}
+            for book in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'page_size': page_size,
+    })
+
+def book_list_context(page, page_size, can_change_book, can_delete_book):
+    """
+    Template context for list_books.html.
+    """
+    # Attach per-book versions so unchanged cards are served from the fragment cache
+    versions = get_book_card_versions([book.id for book in page])
+    for book in page:
+        book.card_version = versions[book.id]
+
+    return {
+        'books': page.object_list,
+        'page': page,
+        'page_size': page_size,
+        'can_change_book': can_change_book,
+        'can_delete_book': can_delete_book,
+        'card_cache': get_card_cache_alias(),
+        'card_cache_timeout': settings.BOOK_CARD_CACHE_TIMEOUT,
+    }
+
+@require_GET
+def export_books(request):
+    """
+    Function-based view that streams the catalog as CSV (default) or NDJSON.
+    Optional ?author=<id> and ?library=<id> filters narrow the export.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return HttpResponseBadRequest('format must be csv or ndjson.')
+
+    try:
+        books = filter_catalog(
+            catalog_books(),
+            author_id=int(request.GET['author']) if request.GET.get('author') else None,
+            library_id=int(request.GET['library']) if request.GET.get('library') else None,
+        )
+    except ValueError:
+        return HttpResponseBadRequest('author and library must be ids.')
+
+    rows = iter_book_rows(books, chunk_size=settings.CATALOG_EXPORT_CHUNK_SIZE)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(iter_ndjson(rows), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+    return response
+
+@require_GET
+def search_books(request):
+    """
+    Function-based view that returns books matching ?q= as JSON.
+    Every term is matched as a prefix of a title or author name word and
+    results are ranked best match first. Paginated with ?page= and ?page_size=.
+    """
+    query = request.GET.get('q', '').strip()
+    page_size = get_page_size(request.GET.get('page_size'))
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return HttpResponseBadRequest('page must be a number.')
+
+    results, has_next = run_search(query, page, page_size) if query else ([], False)
+    return search_page_response(query, page, results, has_next)
+
+def search_page_response(query, page, results, has_next):
+    """
+    JSON response for one page of search_books results.
+    """
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'previous_page': page - 1 if page > 1 else None,
+    })
+
+@require_GET
+def author_autocomplete(request):
+    """
+    Function-based view that returns up to ?limit= authors whose name starts
+    with ?q= as JSON, for the BookForm author widget.
+    """
+    query = request.GET.get('q', '')
+    return JsonResponse({
+        'query': query,
+        'results': autocomplete_authors(query, get_page_size(request.GET.get('limit'))),
+    })
+
+@require_GET
+@catalog_condition
+def api_list(request, resource):
+    """
+    Function-based view for one page of a JSON API resource
+    (see api.py for ?fields=, ?embed= and the filters).
+    """
+    if resource not in RESOURCES:
+        raise Http404('Unknown API resource.')
+    page_size = get_page_size(request.GET.get('page_size'))
+    try:
+        results, page = list_resource(resource, request.GET, request.GET.get('cursor'), page_size)
+    except (APIError, InvalidCursor) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({
+        'results': results,
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'page_size': page_size,
+    })
+
+@require_GET
+@catalog_condition
+def api_detail(request, resource, pk):
+    """
+    Function-based view for a single JSON API record.
+    """
+    if resource not in RESOURCES:
+        raise Http404('Unknown API resource.')
+    try:
+        record = get_resource(resource, pk, request.GET)
+    except APIError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    if record is None:
+        return JsonResponse({'error': 'Not found.'}, status=404)
+    return JsonResponse(record)
+
+def _book_id_list(payload, key):
+    value = payload.get(key, [])
+    if not isinstance(value, list) or not all(type(book_id) is int for book_id in value):
+        raise ValueError(f"{key} must be a list of book ids.")
+    return value
+
+@require_http_methods(['PUT', 'PATCH'])
+@permission_required('relationship_app.change_library', raise_exception=True)
+def library_holdings(request, pk):
+    """
+    Function-based view syncing a library's holdings in bulk.
+    PUT {"books": [...]} replaces the holdings with the given books;
+    PATCH {"add": [...], "remove": [...]} applies a delta.
     """
-    books = Book.objects.all().select_related('author')
-    return render(request, 'relationship_app/list_books.html', {'books': books})
+    library = get_object_or_404(Library, pk=pk)
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object.")
+        if request.method == 'PUT':
+            if 'books' not in payload:
+                raise ValueError("books is required.")
+            added, removed = sync_library_holdings(library, book_ids=_book_id_list(payload, 'books'))
+        else:
+            added, removed = sync_library_holdings(
+                library, add=_book_id_list(payload, 'add'), remove=_book_id_list(payload, 'remove'),
+            )
+    except UnknownBooks as error:
+        return JsonResponse({'error': str(error), 'unknown': error.book_ids}, status=400)
+    except ValueError as error:
+        # Also covers invalid JSON (json.JSONDecodeError)
+        return JsonResponse({'error': str(error)}, status=400)
+    library.refresh_from_db(fields=['book_count'])
+    return JsonResponse({
+        'library': library.pk,
+        'added': len(added),
+        'removed': len(removed),
+        'book_count': library.book_count,
+    })
 
+# Background jobs (see jobs.py); run by "manage.py run_workers"
+
+@require_http_methods(['GET', 'POST'])
+def job_list(request):
+    """
+    Function-based view listing recent jobs (GET) or queuing one (POST
+    {"name": ..., "arguments": {...}}, answered with 202 and the job).
+    """
+    if request.method == 'GET':
+        if not request.user.has_perm('relationship_app.view_job'):
+            raise PermissionDenied
+        jobs = Job.objects.order_by('-id')[:50]
+        return JsonResponse({'results': [serialize_job(job) for job in jobs]})
+
+    if not request.user.has_perm('relationship_app.add_job'):
+        raise PermissionDenied
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict) or not isinstance(payload.get('arguments', {}), dict):
+            raise ValueError("Expected {\"name\": ..., \"arguments\": {...}}.")
+        job = enqueue(payload.get('name'), payload.get('arguments'), user=request.user)
+    except ValueError as error:
+        # Also covers JobError and invalid JSON
+        return JsonResponse({'error': str(error)}, status=400)
+    response = JsonResponse(serialize_job(job), status=202)
+    response['Location'] = reverse('relationship_app:job_detail', args=[job.pk])
+    return response
+
+@require_GET
+@permission_required('relationship_app.view_job', raise_exception=True)
+def job_detail(request, pk):
+    """
+    Function-based view for a job's status, progress and result.
+    """
+    return JsonResponse(serialize_job(get_object_or_404(Job, pk=pk)))
+
+@require_POST
+@permission_required('relationship_app.change_job', raise_exception=True)
+def job_cancel(request, pk):
+    """
+    Function-based view cancelling a queued or running job.
+    """
+    job = cancel_job(get_object_or_404(Job, pk=pk))
+    return JsonResponse(serialize_job(job))
+
+def library_detail_queryset():
+    """
+    Libraries with everything library_detail.html shows.
+    """
+    # Librarian is joined in, books and their authors come from a single
+    # prefetch query, so the page costs the same number of queries
+    # whatever the size of the library.
+    books = Book.objects.select_related('author').order_by('title', 'id')
+    return Library.objects.select_related('librarian').prefetch_related(
+        Prefetch('books', queryset=books)
+    )
+
+@method_decorator(catalog_condition, name='get')
 class LibraryDetailView(DetailView):
     """
     Class-based view that displays details for a specific library,
@@ -41,10 +355,13 @@ class LibraryDetailView(DetailView):
     template_name = 'relationship_app/library_detail.html'
     context_object_name = 'library'
     
+    def get_queryset(self):
+        return library_detail_queryset()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Add additional context if needed
-        context['books_count'] = self.object.books.count()
+        # Denormalized counter column, no COUNT query (see counters.py)
+        context['books_count'] = self.object.book_count
         return context
 
 # Authentication Views
@@ -80,24 +397,26 @@ class CustomLogoutView(LogoutView):
     template_name = 'relationship_app/logout.html'
 
 # Role-Based Access Control Views
+# Roles are resolved through the shared role cache (see roles.py), so these
+# checks do not query UserProfile on every request.
 
 def is_admin(user):
     """
     Check if user has Admin role.
     """
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role == 'Admin'
+    return get_user_role(user) == 'Admin'
 
 def is_librarian(user):
     """
     Check if user has Librarian role.
     """
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role == 'Librarian'
+    return get_user_role(user) == 'Librarian'
 
 def is_member(user):
     """
     Check if user has Member role.
     """
-    return user.is_authenticated and hasattr(user, 'userprofile') and user.userprofile.role == 'Member'
+    return get_user_role(user) == 'Member'
 
 @user_passes_test(is_admin)
 def admin_view(request):
@@ -130,7 +449,9 @@ def add_book(request):
     if request.method == 'POST':
         form = BookForm(request.POST)
         if form.is_valid():
-            book = form.save()
+            # The book and the counters updated by its signals commit together
+            with transaction.atomic():
+                book = form.save()
             messages.success(request, f'Book "{book.title}" has been added successfully!')
             return redirect('relationship_app:list_books')
     else:
@@ -148,7 +469,8 @@ def edit_book(request, book_id):
     if request.method == 'POST':
         form = BookForm(request.POST, instance=book)
         if form.is_valid():
-            book = form.save()
+            with transaction.atomic():
+                book = form.save()
             messages.success(request, f'Book "{book.title}" has been updated successfully!')
             return redirect('relationship_app:list_books')
     else:
@@ -0,0 +1,32 @@
+from django import forms
+from django.urls import reverse
+
+from .models import Author
+
+
+class AuthorAutocompleteWidget(forms.Widget):
+    """
+    Author picker for BookForm: a text box that suggests authors from the
+    author_autocomplete endpoint as the user types, and submits the chosen
+    author's id in a hidden input. Unlike a Select it never lists the
+    authors; rendering looks up the selected author's name by primary key.
+    """
+    template_name = 'relationship_app/widgets/author_autocomplete.html'
+
+    class Media:
+        css = {'all': ['relationship_app/css/author_autocomplete.css']}
+        js = ['relationship_app/js/author_autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['label'] = self.author_name(context['widget']['value'])
+        context['widget']['url'] = reverse('relationship_app:author_autocomplete')
+        return context
+
+    def author_name(self, value):
+        if value in (None, ''):
+            return ''
+        try:
+            return Author.objects.values_list('name', flat=True).get(pk=value)
+        except (Author.DoesNotExist, ValueError):
+            return ''